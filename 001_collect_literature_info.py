@@ -1,16 +1,26 @@
 import os
+import re
 import sys
+import zipfile
 import json
+import hashlib
 import argparse
 import requests
-import pandas as pd
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Any, Optional, Set
+from xml.sax.saxutils import escape as xml_escape
+from typing import Dict, List, Any, Optional, Set, Tuple
 import logging
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
 from tqdm import tqdm
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 导入配置系统
 from config import (
@@ -22,9 +32,223 @@ from config import (
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 标准文献类型（排除附件、笔记等）
+PROPER_ITEM_TYPES = frozenset({
+    'journalArticle', 'conferencePaper', 'book', 'bookSection',
+    'thesis', 'report', 'document', 'preprint', 'patent',
+    'webpage', 'computerProgram', 'software', 'dataset',
+    'presentation', 'videoRecording', 'audioRecording',
+    'artwork', 'map', 'blogPost', 'forumPost', 'email',
+    'letter', 'manuscript', 'encyclopediaArticle', 'dictionaryEntry',
+    'newspaperArticle', 'magazineArticle', 'case', 'statute',
+    'hearing', 'bill', 'treaty', 'regulation', 'standard'
+})
+
+# 导出文件的列顺序（与_get_single_item_details返回的字段一致）
+# authors/tags/collections等多值字段在内存中保持为列表，仅在写入xlsx时以'; '连接
+LITERATURE_COLUMNS = (
+    'item_key',
+    'title',
+    'item_type',
+    'authors',
+    'publication_title',
+    'conference_name',
+    'date',
+    'doi',
+    'abstract',
+    'tags',
+    'url',
+    'language',
+    'pages',
+    'volume',
+    'issue',
+    'publisher',
+    'place',
+    'edition',
+    'series',
+    'isbn',
+    'issn',
+    'call_number',
+    'access_date',
+    'rights',
+    'extra',
+    'collections',
+    'collections_keys',
+    'collections_count',
+    'notes',
+    'attachments',
+    'attachments_count',
+    'related_items',
+    'related_items_count',
+    'created_date',
+    'modified_date',
+    'last_modified_by',
+    'version',
+)
+
+# 导出列 -> Zotero data字段 的直接映射
+ITEM_FIELD_MAP = (
+    ('title', 'title'),
+    ('date', 'date'),
+    ('doi', 'DOI'),
+    ('url', 'url'),
+    ('pages', 'pages'),
+    ('volume', 'volume'),
+    ('issue', 'issue'),
+    ('place', 'place'),
+    ('edition', 'edition'),
+    ('series', 'series'),
+    ('isbn', 'ISBN'),
+    ('issn', 'ISSN'),
+    ('call_number', 'callNumber'),
+    ('access_date', 'accessDate'),
+    ('rights', 'rights'),
+    ('extra', 'extra'),
+    ('last_modified_by', 'lastModifiedByUser'),
+)
+
+# 取值重复度高、需要驻留的字段
+INTERNED_ITEM_FIELD_MAP = (
+    ('item_type', 'itemType'),
+    ('publication_title', 'publicationTitle'),
+    ('conference_name', 'conferenceName'),
+    ('publisher', 'publisher'),
+    ('language', 'language'),
+)
+
+# 多值字段（内存中为列表，写出时以'; '连接）
+LIST_COLUMNS = frozenset({
+    'authors', 'tags', 'collections', 'collections_keys', 'attachments', 'related_items'
+})
+
+# xlsx 固定部件（单工作表，内联字符串，无样式）
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Sheet1" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    # 样式0为默认，样式1为日期时间（内置格式22: m/d/yy h:mm）
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="2">'
+        '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '</cellXfs>'
+        '</styleSheet>'
+    ),
+}
+_XLSX_SHEET_HEADER = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_XLSX_SHEET_FOOTER = b'</sheetData></worksheet>'
+
+# Excel 1900日期系统的零点（已包含1900闰年误差的修正）
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# XML 1.0 不允许的控制字符
+_XML_ILLEGAL_CHARS_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _parse_json_response(response: requests.Response) -> Any:
+    """解析响应JSON，优先用orjson直接解析原始字节（避免先解码为str）"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+def _respect_backoff(response: requests.Response) -> None:
+    """Zotero负载过高时会返回Backoff响应头，要求客户端暂停指定秒数"""
+    backoff = response.headers.get('Backoff')
+    if backoff:
+        try:
+            seconds = float(backoff)
+        except ValueError:
+            return
+        logger.warning(f"⏳ Zotero要求暂停请求 {seconds:.0f} 秒")
+        time.sleep(seconds)
+
+
+def _parse_zotero_timestamp(value: str):
+    """将Zotero的ISO8601时间（如2024-01-02T03:04:05Z）解析为UTC naive datetime，无法解析时原样返回"""
+    if not value:
+        return value
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return value
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _column_letter(index: int) -> str:
+    """将1起始的列序号转换为Excel列名（1 -> A, 27 -> AA）"""
+    letters = ''
+    while index > 0:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _xlsx_row(row_idx: int, col_letters: List[str], values) -> bytes:
+    """生成一行sheetData XML，时间写为日期单元格，数字写为数值单元格，列表以'; '连接，其余写为内联字符串"""
+    cells = []
+    for col, value in zip(col_letters, values):
+        if isinstance(value, list):
+            value = '; '.join(value)
+        if value is None or value == '':
+            continue
+        ref = f"{col}{row_idx}"
+        if isinstance(value, datetime):
+            serial = (value - _EXCEL_EPOCH).total_seconds() / 86400
+            cells.append(f'<c r="{ref}" s="1"><v>{serial}</v></c>')
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        else:
+            text = xml_escape(_XML_ILLEGAL_CHARS_RE.sub('', str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{row_idx}">{"".join(cells)}</row>'.encode('utf-8')
+
+
 class LiteratureCollector:
     """文献信息收集器"""
     
+    # 进程内共享的集合缓存，按(user_id, API密钥哈希)区分，多个收集器实例复用
+    # 值为(获取时间, 集合映射)
+    _shared_collections_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, str]]] = {}
+    
     def __init__(self, abstract_limit: int = None):
         """初始化收集器"""
         self.zotero_config = get_zotero_config()
@@ -32,105 +256,192 @@ class LiteratureCollector:
         self.user_id = self.zotero_config.user_id
         self.headers = self.zotero_config.headers
         self.data_dir = Path("data")
+        
+        # 分页并发数，复用同一个Session的连接池（连接池大小与并发数一致）
+        # 429/5xx自动重试，并遵循Zotero返回的Retry-After
+        self.max_workers = 8
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         self.data_dir.mkdir(exist_ok=True)
         
-        # 缓存集合信息
-        self._collections_cache = None
-        self._collections_cache_time = 0
+        # 缓存集合信息（类级别内存缓存 + 磁盘缓存）
+        api_key_hash = hashlib.sha256(self.zotero_config.api_key.encode('utf-8')).hexdigest()
+        self._collections_cache_key = (self.user_id, api_key_hash)
         self._cache_ttl = 300  # 5分钟缓存
+        # 磁盘缓存按user_id区分文件并在内容中记录user_id，切换Zotero库后不会复用其他库的集合；
+        # 文件名与002脚本的缓存（额外保存父集合映射）不同，两个脚本互不覆盖
+        self._collections_cache_file = self.data_dir / f".collections_cache_{self.user_id}.json"
         
         # 摘要长度限制
         self.abstract_limit = abstract_limit or get_abstract_limit()
         
         # 标准文献类型（排除附件、笔记等）
-        self.proper_item_types = {
-            'journalArticle', 'conferencePaper', 'book', 'bookSection', 
-            'thesis', 'report', 'document', 'preprint', 'patent',
-            'webpage', 'computerProgram', 'software', 'dataset',
-            'presentation', 'videoRecording', 'audioRecording',
-            'artwork', 'map', 'blogPost', 'forumPost', 'email',
-            'letter', 'manuscript', 'encyclopediaArticle', 'dictionaryEntry',
-            'newspaperArticle', 'magazineArticle', 'case', 'statute',
-            'hearing', 'bill', 'treaty', 'regulation', 'standard'
-        }
+        self.proper_item_types = PROPER_ITEM_TYPES
         
         # 统计信息
         self.total_items = 0
         self.proper_items = 0
         self.unfiled_items = 0
         self.exported_items = 0
+        self.with_abstract = 0
+        self.with_doi = 0
+        self.collection_links = 0
+        self.type_counts = Counter()
+
+    def _fetch_items_page(self, start: int, batch_size: int) -> requests.Response:
+        """获取单页文献项目"""
+        url = f"{self.base_url}/items"
+        params = {
+            'start': start,
+            'limit': batch_size,
+            'format': 'json'
+        }
+        
+        response = self.session.get(url, headers=self.headers, params=params, timeout=30)
+        response.raise_for_status()
+        _respect_backoff(response)
+        return response
 
-    def get_all_items(self, limit: int = None) -> List[Dict[str, Any]]:
-        """获取所有文献项目（优化版本）"""
-        all_items = []
-        start = 0
+    def get_all_items(self, limit: int = None) -> Optional[List[Dict[str, Any]]]:
+        """获取所有文献项目（并发分页版本），任何一页获取失败都返回None，避免导出缺页的文献数据"""
         batch_size = min(limit or get_default_limit(), 100)  # 限制批量大小
         
         logger.info(f"📊 开始获取文献项目 (批量大小: {batch_size})...")
         
-        with tqdm(desc="获取文献") as pbar:
-            while True:
-                try:
-                    url = f"{self.base_url}/items"
-                    params = {
-                        'start': start,
-                        'limit': batch_size,
-                        'format': 'json'
+        # 先获取第一页，从Total-Results响应头得到总数
+        try:
+            response = self._fetch_items_page(0, batch_size)
+            first_items = _parse_json_response(response)
+            total = int(response.headers.get('Total-Results', len(first_items)))
+        except Exception as e:
+            logger.error(f"❌ 获取文献项目失败: {e}")
+            return None
+        
+        if limit:
+            total = min(total, limit)
+        
+        # 剩余页面并发获取，按起始位置保存以保持原有顺序
+        pages = {0: first_items}
+        offsets = range(batch_size, total, batch_size) if first_items else range(0)
+        
+        with tqdm(total=total, desc="获取文献", mininterval=0.5, smoothing=0, disable=None) as pbar:
+            pbar.update(len(first_items))
+            
+            if offsets:
+                max_workers = min(self.max_workers, len(offsets))
+                with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                    future_to_start = {
+                        executor.submit(self._fetch_items_page, start, batch_size): start
+                        for start in offsets
                     }
-                
-                    response = requests.get(url, headers=self.headers, params=params, timeout=30)
-                    response.raise_for_status()
                     
-                    items = response.json()
-                    if not items:
-                        break
-                    
-                    all_items.extend(items)
-                    start += len(items)
-                    pbar.update(len(items))
-                    
-                    # 如果达到限制，停止
-                    if limit and len(all_items) >= limit:
-                        all_items = all_items[:limit]
-                        break
-                        
-                    # 如果返回的项目数少于批量大小，说明已经获取完所有项目
-                    if len(items) < batch_size:
-                        break
-                    
-                except Exception as e:
-                    logger.error(f"❌ 获取文献项目失败: {e}")
-                    break
+                    for future in as_completed(future_to_start):
+                        start = future_to_start[future]
+                        try:
+                            items = _parse_json_response(future.result())
+                            pages[start] = items
+                            pbar.update(len(items))
+                        except Exception as e:
+                            logger.error(f"❌ 获取文献项目失败 (start={start}): {e}")
+                            for pending in future_to_start:
+                                pending.cancel()
+                            return None
+        
+        all_items = [item for start in sorted(pages) for item in pages[start]]
+        
+        # 如果达到限制，截断
+        if limit and len(all_items) > limit:
+            all_items = all_items[:limit]
         
         logger.info(f"✅ 总共获取到 {len(all_items)} 个项目")
         return all_items
 
+    def _fetch_collections_page(self, start: int, headers: Dict[str, str] = None) -> requests.Response:
+        """获取单页集合（Zotero默认只返回25个，需显式分页）"""
+        url = f"{self.base_url}/collections"
+        params = {'start': start, 'limit': 100}
+        
+        response = self.session.get(url, headers=headers or self.headers, params=params, timeout=30)
+        response.raise_for_status()
+        _respect_backoff(response)
+        return response
+
+    def _load_collections_disk_cache(self) -> Optional[Dict[str, Any]]:
+        """读取磁盘上的集合缓存（按库版本号标记）"""
+        if not self._collections_cache_file.exists():
+            return None
+        try:
+            raw = self._collections_cache_file.read_bytes()
+            cache = orjson.loads(raw) if orjson is not None else json.loads(raw)
+            if cache.get('user_id') != str(self.user_id):
+                logger.info("ℹ️  集合缓存不属于当前Zotero库，忽略")
+                return None
+            if 'version' in cache and isinstance(cache.get('collections'), dict):
+                return cache
+        except Exception as e:
+            logger.warning(f"⚠️  读取集合缓存失败: {e}")
+        return None
+
+    def _save_collections_disk_cache(self, version: str, collection_dict: Dict[str, str]) -> None:
+        """写入磁盘集合缓存"""
+        cache = {'user_id': str(self.user_id), 'version': version, 'collections': collection_dict}
+        try:
+            if orjson is not None:
+                self._collections_cache_file.write_bytes(orjson.dumps(cache))
+            else:
+                self._collections_cache_file.write_text(json.dumps(cache, ensure_ascii=False), encoding='utf-8')
+        except Exception as e:
+            logger.warning(f"⚠️  保存集合缓存失败: {e}")
+
     def _get_all_collections(self) -> Dict[str, str]:
-        """获取所有集合的key到name的映射（带缓存）"""
+        """获取所有集合的key到name的映射（内存缓存 + 按库版本号的磁盘缓存）"""
         current_time = time.time()
         
-        # 检查缓存是否有效
-        if (self._collections_cache is not None and 
-            current_time - self._collections_cache_time < self._cache_ttl):
-            return self._collections_cache
+        # 检查缓存是否有效（同一进程内的其他收集器实例可能已获取过）
+        cached = self._shared_collections_cache.get(self._collections_cache_key)
+        if cached is not None and current_time - cached[0] < self._cache_ttl:
+            return cached[1]
         
         try:
-            url = f"{self.base_url}/collections"
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
+            headers = self.headers
             
-            collections = response.json()
-            collection_dict = {}
+            # 库版本未变化时Zotero返回304，直接使用磁盘缓存
+            disk_cache = self._load_collections_disk_cache()
+            if disk_cache is not None:
+                headers = {**self.headers, 'If-Modified-Since-Version': str(disk_cache['version'])}
             
-            for collection in collections:
-                key = collection.get('key')
-                name = collection.get('data', {}).get('name', '')
-                if key and name:
-                    collection_dict[key] = name
+            response = self._fetch_collections_page(0, headers)
+            if response.status_code == 304 and disk_cache is not None:
+                logger.info(f"✅ 集合未变化 (库版本 {disk_cache['version']})，使用磁盘缓存")
+                collection_dict = disk_cache['collections']
+            else:
+                collections = _parse_json_response(response)
+                
+                # 根据Total-Results并发获取剩余页面
+                total = int(response.headers.get('Total-Results', len(collections)))
+                offsets = range(100, total, 100) if collections else range(0)
+                if offsets:
+                    with ThreadPoolExecutor(max_workers=min(self.max_workers, len(offsets))) as executor:
+                        for page in executor.map(self._fetch_collections_page, offsets):
+                            collections.extend(_parse_json_response(page))
+                
+                collection_dict = {}
+                
+                for collection in collections:
+                    key = collection.get('key')
+                    name = collection.get('data', {}).get('name', '')
+                    if key and name:
+                        collection_dict[key] = name
+                
+                version = response.headers.get('Last-Modified-Version')
+                if version:
+                    self._save_collections_disk_cache(version, collection_dict)
             
             # 更新缓存
-            self._collections_cache = collection_dict
-            self._collections_cache_time = current_time
+            self._shared_collections_cache[self._collections_cache_key] = (current_time, collection_dict)
             
             return collection_dict
             
@@ -140,122 +451,102 @@ class LiteratureCollector:
 
     def _is_proper_item(self, item: Dict[str, Any]) -> bool:
         """判断是否为标准文献项目"""
-        item_type = item.get('data', {}).get('itemType', '')
-        return item_type in self.proper_item_types
+        return item.get('data', {}).get('itemType') in PROPER_ITEM_TYPES
 
     def _has_collection(self, item: Dict[str, Any]) -> bool:
         """判断项目是否有分类"""
         collections = item.get('data', {}).get('collections', [])
         return len(collections) > 0
 
-    def _get_item_details_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """批量获取文献详细信息（并行处理）"""
+    def _get_item_details_batch(self, items: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+        """批量提取文献详细信息，按列存储（列表接口已返回完整data，无需逐条请求）"""
+        columns = {name: [] for name in LITERATURE_COLUMNS}
         if not items:
-            return []
+            return columns
         
-        logger.info(f"🔍 开始批量获取 {len(items)} 个项目的详细信息...")
+        logger.info(f"🔍 开始提取 {len(items)} 个项目的详细信息...")
         
-        # 使用线程池并行处理
-        max_workers = min(10, len(items))  # 限制并发数
-        detailed_items = []
+        # 集合映射只获取一次
+        all_collections = self._get_all_collections()
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_item = {
-                executor.submit(self._get_single_item_details, item): item 
-                for item in items
-            }
-            
-            # 收集结果
-            with tqdm(total=len(items), desc="提取详细信息") as pbar:
-                for future in as_completed(future_to_item):
-                    try:
-                        details = future.result()
-                        if details:
-                            detailed_items.append(details)
-                        pbar.update(1)
-                            
-                    except Exception as e:
-                        item = future_to_item[future]
-                        logger.warning(f"⚠️  处理项目失败 {item.get('key', 'unknown')}: {e}")
-                        pbar.update(1)
-        
-        logger.info(f"✅ 批量处理完成，成功获取 {len(detailed_items)} 个项目的详细信息")
-        return detailed_items
-
-    def _get_single_item_details(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """获取单个文献详细信息"""
+        # 进度条按块更新，避免逐项刷新
+        progress_step = 100
+        with tqdm(total=len(items), desc="提取详细信息", mininterval=0.5, smoothing=0, disable=None) as pbar:
+            for idx, item in enumerate(items, 1):
+                details = self._get_single_item_details(item, all_collections)
+                if details:
+                    for name, column in columns.items():
+                        column.append(details[name])
+                    
+                    # 提取时顺带累计统计，导出后无需再遍历各列
+                    self.with_abstract += bool(details['abstract'])
+                    self.with_doi += bool(details['doi'])
+                    self.collection_links += details['collections_count']
+                    self.type_counts[details['item_type']] += 1
+                
+                if idx % progress_step == 0:
+                    pbar.update(progress_step)
+            pbar.update(len(items) % progress_step)
+        
+        logger.info(f"✅ 批量处理完成，成功获取 {len(columns['item_key'])} 个项目的详细信息")
+        return columns
+
+    def _get_single_item_details(self, item: Dict[str, Any], all_collections: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """从已获取的项目数据中提取单个文献详细信息（不发起请求）"""
         try:
             item_data = item.get('data', {})
             
-            # 基本信息
-            details = {
+            # 直接映射的字段（一次遍历映射表完成）
+            details = {column: item_data.get(field, '') for column, field in ITEM_FIELD_MAP}
+            # 类型/期刊/会议/出版社/语言取值重复度高，驻留为同一字符串对象
+            for column, field in INTERNED_ITEM_FIELD_MAP:
+                details[column] = sys.intern(item_data.get(field) or '')
+            
+            # 需要额外处理的字段
+            details.update({
                 'item_key': item.get('key', ''),
-                'title': item_data.get('title', ''),
-                'item_type': item_data.get('itemType', ''),
                 'authors': self._extract_authors(item_data),
-                'publication_title': item_data.get('publicationTitle', ''),
-                'conference_name': item_data.get('conferenceName', ''),
-                'date': item_data.get('date', ''),
-                'doi': item_data.get('DOI', ''),
                 'abstract': self._extract_abstract(item_data),
                 'tags': self._extract_tags(item_data),
-                'url': item_data.get('url', ''),
-                'language': item_data.get('language', ''),
-                'pages': item_data.get('pages', ''),
-                'volume': item_data.get('volume', ''),
-                'issue': item_data.get('issue', ''),
-                'publisher': item_data.get('publisher', ''),
-                'place': item_data.get('place', ''),
-                'edition': item_data.get('edition', ''),
-                'series': item_data.get('series', ''),
-                'isbn': item_data.get('ISBN', ''),
-                'issn': item_data.get('ISSN', ''),
-                'call_number': item_data.get('callNumber', ''),
-                'access_date': item_data.get('accessDate', ''),
-                'rights': item_data.get('rights', ''),
-                'extra': item_data.get('extra', ''),
-                'collections': '',
-                'collections_keys': '',
+                'collections': [],
+                'collections_keys': [],
                 'collections_count': 0,
                 'notes': '',
-                'attachments': '',
+                'attachments': [],
                 'attachments_count': 0,
-                'related_items': '',
+                'related_items': [],
                 'related_items_count': 0,
-                'created_date': item_data.get('dateAdded', ''),
-                'modified_date': item_data.get('dateModified', ''),
-                'last_modified_by': item_data.get('lastModifiedByUser', ''),
+                'created_date': _parse_zotero_timestamp(item_data.get('dateAdded', '')),
+                'modified_date': _parse_zotero_timestamp(item_data.get('dateModified', '')),
                 'version': item.get('version', '')
-            }
+            })
             
             # 获取集合信息
             collections = item_data.get('collections', [])
             if collections:
                 details['collections_count'] = len(collections)
-                details['collections_keys'] = '; '.join(collections)
+                details['collections_keys'] = collections
                 
                 # 获取集合名称
-                all_collections = self._get_all_collections()
                 collection_names = []
                 for collection_key in collections:
                     collection_name = all_collections.get(collection_key, '')
                     if collection_name:
                         collection_names.append(collection_name)
-                details['collections'] = '; '.join(collection_names)
+                details['collections'] = collection_names
             
             # 获取附件信息
             attachments = item.get('attachments', [])
             if attachments:
                 details['attachments_count'] = len(attachments)
                 attachment_names = [att.get('data', {}).get('title', '') for att in attachments]
-                details['attachments'] = '; '.join(attachment_names)
+                details['attachments'] = attachment_names
             
             # 获取相关项目信息
             related_items = item.get('relatedItems', [])
             if related_items:
                 details['related_items_count'] = len(related_items)
-                details['related_items'] = '; '.join(related_items)
+                details['related_items'] = related_items
             
             return details
             
@@ -263,20 +554,25 @@ class LiteratureCollector:
             logger.warning(f"⚠️  获取项目详情失败: {e}")
             return None
 
-    def _extract_authors(self, item_data: Dict[str, Any]) -> str:
+    def _extract_authors(self, item_data: Dict[str, Any]) -> List[str]:
         """提取作者信息"""
         creators = item_data.get('creators', [])
         if not creators:
-            return ''
+            return []
         
         author_names = []
         for creator in creators:
             if creator.get('creatorType') == 'author':
-                name = creator.get('name', '') or f"{creator.get('firstName', '')} {creator.get('lastName', '')}".strip()
+                # 单字段姓名直接使用；双字段姓名只在两者都存在时拼接
+                name = creator.get('name')
+                if not name:
+                    first = creator.get('firstName')
+                    last = creator.get('lastName')
+                    name = first + ' ' + last if first and last else last or first
                 if name:
                     author_names.append(name)
         
-        return '; '.join(author_names)
+        return author_names
 
     def _extract_abstract(self, item_data: Dict[str, Any]) -> str:
         """提取摘要信息"""
@@ -285,13 +581,15 @@ class LiteratureCollector:
         if not abstract:
             abstract = item_data.get('extra', '')
         if not abstract:
-            # 从notes中查找摘要
-            notes = item_data.get('notes', [])
-            for note in notes:
-                note_content = note.get('data', {}).get('note', '')
-                if 'abstract' in note_content.lower() or '摘要' in note_content:
-                    abstract = note_content
-                    break
+            # 从notes中查找摘要（摘要标记通常出现在笔记开头，只检查前200个字符）
+            notes = item_data.get('notes')
+            if notes:
+                for note in notes:
+                    note_content = note.get('data', {}).get('note', '')
+                    head = note_content[:200]
+                    if '摘要' in head or 'abstract' in head.lower():
+                        abstract = note_content
+                        break
         
         # 限制摘要长度
         abstract_limit = self.abstract_limit
@@ -300,35 +598,77 @@ class LiteratureCollector:
         
         return abstract
 
-    def _extract_tags(self, item_data: Dict[str, Any]) -> str:
+    def _extract_tags(self, item_data: Dict[str, Any]) -> List[str]:
         """提取标签信息"""
         tags = item_data.get('tags', [])
         if not tags:
-            return ''
+            return []
         
-        tag_names = [tag.get('tag', '') for tag in tags if tag.get('tag')]
-        return '; '.join(tag_names)
+        return [tag.get('tag', '') for tag in tags if tag.get('tag')]
 
-    def collect_and_save(self, limit: int = None) -> str:
-        """收集所有文献信息并保存到Excel文件"""
+    def _log_export_summary(self) -> None:
+        """输出导出数据的汇总统计（计数已在提取时累计）"""
+        logger.info("📊 导出数据概况:")
+        logger.info(f"   有摘要: {self.with_abstract}/{self.exported_items}")
+        logger.info(f"   有DOI: {self.with_doi}/{self.exported_items}")
+        logger.info(f"   平均集合数: {self.collection_links / self.exported_items:.2f}")
+        for item_type, count in self.type_counts.most_common():
+            logger.info(f"   {item_type}: {count}")
+
+    def _save_to_excel(self, filepath: Path, columns: Dict[str, List[Any]]) -> None:
+        """直接以ZIP流写出xlsx的XML（逐行写入，不经过openpyxl对象树）"""
+        col_letters = [_column_letter(i) for i in range(1, len(columns) + 1)]
+        
+        with zipfile.ZipFile(filepath, 'w', zipfile.ZIP_DEFLATED) as zf:
+            for name, content in _XLSX_STATIC_PARTS.items():
+                zf.writestr(name, content)
+            
+            with zf.open('xl/worksheets/sheet1.xml', 'w') as sheet:
+                sheet.write(_XLSX_SHEET_HEADER)
+                sheet.write(_xlsx_row(1, col_letters, list(columns)))
+                for row_idx, row in enumerate(zip(*columns.values()), start=2):
+                    sheet.write(_xlsx_row(row_idx, col_letters, row))
+                sheet.write(_XLSX_SHEET_FOOTER)
+
+    def _save_to_parquet(self, filepath: Path, columns: Dict[str, List[Any]]) -> None:
+        """按列写出Parquet文件（列内容与xlsx一致，供后续脚本快速读取）"""
+        import pandas as pd
+        
+        data = {
+            name: ['; '.join(v) if isinstance(v, list) else v for v in values]
+            if name in LIST_COLUMNS else values
+            for name, values in columns.items()
+        }
+        df = pd.DataFrame(data)
+        # 无法解析的时间保留为字符串会导致列类型混杂，这里统一转换
+        for name in ('created_date', 'modified_date'):
+            df[name] = pd.to_datetime(df[name], errors='coerce')
+        df.to_parquet(filepath, index=False, compression='zstd')
+
+    def collect_and_save(self, limit: int = None, output_format: str = 'xlsx') -> str:
+        """收集所有文献信息并保存到Excel（或Parquet）文件"""
         start_time = time.time()
         logger.info("🚀 开始收集文献信息...")
         
-        # 获取所有项目
+        # 获取所有项目（项目列表不完整时不导出，否则缺页的文献会从数据文件中静默消失）
         all_items = self.get_all_items(limit)
+        if all_items is None:
+            return ""
         self.total_items = len(all_items)
         
-        # 筛选标准文献项目
-        proper_items = [item for item in all_items if self._is_proper_item(item)]
-        self.proper_items = len(proper_items)
-        
-        # 筛选有分类的文献
-        classified_items = [item for item in proper_items if self._has_collection(item)]
+        # 单次遍历筛选有分类的标准文献项目（不保留中间的标准文献列表）
+        classified_items = []
+        self.proper_items = 0
+        for item in all_items:
+            if self._is_proper_item(item):
+                self.proper_items += 1
+                if self._has_collection(item):
+                    classified_items.append(item)
         
         # 批量获取详细信息
-        detailed_items = self._get_item_details_batch(classified_items)
+        detailed_columns = self._get_item_details_batch(classified_items)
         
-        self.exported_items = len(detailed_items)
+        self.exported_items = len(detailed_columns['item_key'])
         
         elapsed_time = time.time() - start_time
         
@@ -340,23 +680,31 @@ class LiteratureCollector:
         logger.info(f"   导出项目数: {self.exported_items}")
         logger.info(f"   处理时间: {elapsed_time:.2f}秒")
         
-        if not detailed_items:
+        if not self.exported_items:
             logger.warning("⚠️  没有找到有分类的文献需要导出")
             return ""
         
+        self._log_export_summary()
+        
         # 生成文件名
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"literature_info_{timestamp}.xlsx"
+        filename = f"literature_info_{timestamp}.{output_format}"
         filepath = self.data_dir / filename
         
-        # 保存到Excel
+        # 保存到Excel或Parquet
         try:
-            df = pd.DataFrame(detailed_items)
-            df.to_excel(filepath, index=False, engine='openpyxl')
             logger.info(f"💾 正在保存到 {filepath}...")
+            if output_format == 'parquet':
+                self._save_to_parquet(filepath, detailed_columns)
+            else:
+                self._save_to_excel(filepath, detailed_columns)
             return str(filepath)
+        except ImportError as e:
+            logger.error(f"❌ 无法导出Parquet文件，缺少依赖: {e}")
+            logger.info("请安装: pip install pandas pyarrow")
+            return ""
         except Exception as e:
-            logger.error(f"❌ 导出Excel文件失败: {e}")
+            logger.error(f"❌ 导出{output_format}文件失败: {e}")
             return ""
 
 def main():
@@ -367,6 +715,7 @@ def main():
         epilog="""
 使用示例:
   python 001_collect_literature_info.py --limit 1000
+  python 001_collect_literature_info.py --format parquet
 
 注意事项:
   - 需要配置Zotero API环境变量
@@ -378,6 +727,8 @@ def main():
     # 可选参数
     parser.add_argument('--limit', type=int, help='限制检查的文献数量')
     parser.add_argument('--abstract-limit', type=int, help=f'摘要长度限制（默认: {get_abstract_limit()}字符）')
+    parser.add_argument('--format', type=str, choices=['xlsx', 'parquet'], default='xlsx',
+                       help='输出格式（默认: xlsx；parquet写入更快，需要安装pyarrow）')
     
     args = parser.parse_args()
     
@@ -397,7 +748,7 @@ def main():
         collector = LiteratureCollector(abstract_limit=args.abstract_limit)
         
         # 收集并保存文献信息
-        result_file = collector.collect_and_save(limit=args.limit)
+        result_file = collector.collect_and_save(limit=args.limit, output_format=args.format)
         
         if result_file:
             print(f"\n✅ 收集完成！")
@@ -17,11 +17,16 @@ import os
 import sys
 import json
 import argparse
+import random
+import time
 from pathlib import Path
-from typing import Dict, Any, Optional, List
-import pandas as pd
-import requests
+from typing import Dict, Any, Optional, List, Tuple, TYPE_CHECKING
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 导入配置系统
 from config import (
@@ -29,84 +34,332 @@ from config import (
     get_default_max_items, get_default_test_items, get_default_dry_run_items,
     get_max_tokens_limit, get_default_output_tokens, get_description_preview_length
 )
-from llm_client import LLMClient
 
-# 导入自定义模块（延迟导入）
-# from llm_client import LLMClient
+# pandas、requests和llm_client（openai/httpx）导入较慢，在实际用到的方法中延迟导入，
+# 不需要它们的模式（如--create-collections不加载LLM，生成schema不加载requests）启动更快
+if TYPE_CHECKING:
+    import pandas as pd
+    import requests
 
 # 设置日志
 import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-from pydantic import BaseModel, ValidationError, Field
+from pydantic import TypeAdapter, ValidationError
+from typing_extensions import TypedDict
 import re
 
-class SubCategoryModel(BaseModel):
+
+def _write_json_file(filepath: str, data: Any) -> None:
+    """
+    原子写出JSON文件，优先使用orjson直接序列化为UTF-8字节（2空格缩进）
+    
+    先写入同目录的临时文件并fsync，再用os.replace替换目标文件，
+    中途崩溃或Ctrl-C不会留下截断的schema（否则下一步解析失败只能重新调用LLM）
+    """
+    if orjson is not None:
+        payload = orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        payload = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    
+    tmp_path = f"{filepath}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _respect_backoff(response: "requests.Response") -> None:
+    """Zotero负载过高时会返回Backoff响应头，要求客户端暂停指定秒数"""
+    backoff = response.headers.get('Backoff')
+    if backoff:
+        try:
+            seconds = float(backoff)
+        except ValueError:
+            return
+        logger.warning(f"⏳ Zotero要求暂停请求 {seconds:.0f} 秒")
+        time.sleep(seconds)
+
+
+def _read_json_file(filepath: str) -> Any:
+    """读取JSON文件，优先使用orjson解析"""
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+
+def _parse_response_json(response: "requests.Response") -> Any:
+    """直接解析响应原始字节，跳过requests.json()的编码探测（Zotero API固定返回UTF-8）"""
+    return orjson.loads(response.content) if orjson is not None else json.loads(response.content)
+
+
+# schema结构定义为TypedDict，经TypeAdapter校验后直接得到普通dict，
+# 不创建模型实例，也不需要再model_dump转换回dict（pydantic要求使用typing_extensions的TypedDict）
+class SubCategoryModel(TypedDict):
     name: str
     description: str
 
-class MainCategoryModel(BaseModel):
+class MainCategoryModel(TypedDict):
     name: str
     description: str
     subcategories: dict[str, SubCategoryModel]
 
-class ClassificationSchemaModel(BaseModel):
+class ClassificationSchemaModel(TypedDict):
     main_categories: dict[str, MainCategoryModel]
 
+_MAIN_CATEGORY_ADAPTER = TypeAdapter(MainCategoryModel)
+_SCHEMA_ADAPTER = TypeAdapter(ClassificationSchemaModel)
+
 
 def verify_schema(schema: dict) -> list[str]:
     """验证LLM生成的schema结构和内容是否合法，返回错误列表"""
     errors = []
     try:
-        model = ClassificationSchemaModel(**schema)
+        validated = _SCHEMA_ADAPTER.validate_python(schema)
     except ValidationError as e:
         errors.append(f"结构校验失败: {e}")
         return errors
     
-    main_categories = schema.get("main_categories", {})
+    # 结构校验通过后字段必然存在，直接下标访问，避免在原始dict上反复.get()
+    main_categories = validated['main_categories']
     if not (5 <= len(main_categories) <= 20):
         errors.append(f"主分类数量不在5-20范围: {len(main_categories)}")
     
     for code, main_cat in main_categories.items():
-        name = main_cat.get("name", "")
+        name = main_cat['name']
         
         # 主分类名称验证
         if not name.startswith("[AUTO]"):
             errors.append(f"主分类 {code} 名称未以[AUTO]开头: {name}")
         
         # 主分类词数验证（移除[AUTO]前缀后计算）
-        clean_name = name.replace('[AUTO]', '').strip()
-        word_count = len(clean_name.split())
+        word_count = len(name.replace('[AUTO]', '').split())
         if not (1 <= word_count <= 10):
             errors.append(f"主分类 {code} 名称词数不在1-10: {name}")
         
         # 子分类验证
-        subcats = main_cat.get("subcategories", {})
+        subcats = main_cat['subcategories']
         if not (2 <= len(subcats) <= 10):
             errors.append(f"主分类 {code} 子分类数量不在2-10: {len(subcats)}")
         
         for sub_code, sub_cat in subcats.items():
-            sub_name = sub_cat.get("name", "")
-            
             # 子分类词数验证（更宽松，允许1-10个词）
+            sub_name = sub_cat['name']
             sub_word_count = len(sub_name.split())
             if not (1 <= sub_word_count <= 10):
                 errors.append(f"子分类 {sub_code} 名称词数不在1-10: {sub_name}")
     
     return errors
 
+# token估算：第1组为中文字符（包括中文标点），第2组为其余非空白字符组成的单词
+_CJK_CHARS = '\u4e00-\u9fff\u3000-\u303f\uff00-\uffef'
+_TOKEN_ESTIMATE_RE = re.compile(f'([{_CJK_CHARS}])|([^\\s{_CJK_CHARS}]+)')
+_NON_WORD_CHAR_RE = re.compile(r'[^\w]')
+
+# 摘要去重时的单词切分
+_WORD_TOKEN_RE = re.compile(r'\w+')
+
+# 单次生成分类体系时使用的用户提示词
+_USER_PROMPT_TEMPLATE = """Please design a comprehensive and well-balanced Computer Science classification system based on the following {sample_count} literature samples.\n\nLiterature Samples:\n{literature_text}\n\nIMPORTANT: Please ensure that your classification system:\n1. Covers ALL significant research areas present in the literature samples\n2. Provides balanced representation across different CS domains\n3. Includes specific categories for any specialized research areas (e.g., High Energy Physics, Scientific Computing, etc.)\n4. Uses standard Computer Science terminology and naming conventions\n5. Category names should be concise (2-4 words, maximum 5 words)\n6. Create more granular subcategories (4-10 per main category) for better organization\n7. ALL main category names MUST be prefixed with "[AUTO]" (e.g., "[AUTO] AI and Machine Learning Models")\n\nPlease return the classification system in JSON format:\n{{\n    "main_categories": {{\n        "category_code": {{\n            "name": "Category Name",\n            "description": "Category Description",\n            "subcategories": {{\n                "subcategory_code": {{\n                    "name": "Subcategory Name", \n                    "description": "Subcategory Description"\n                }}\n            }}\n        }}\n    }}\n}}\n\nRequirements:\n- All category names and descriptions must be in English\n- Use professional Computer Science terminology\n- Ensure comprehensive coverage of ALL research areas in the literature\n- Maintain clear hierarchical structure with main categories and subcategories\n- Focus on Computer Science domains while including interdisciplinary applications\n- Category names must be concise (2-4 words, never exceed 5 words)\n- Create more granular subcategories (3-6 per main category) for better organization\n- ALL main category names MUST be prefixed with "[AUTO]" (e.g., "[AUTO] AI and Machine Learning Models")"""
+
+# 摘要截断后至少保留的估算token数，低于该值时摘要已无区分度，改用分片map-reduce
+_MIN_ABSTRACT_TOKENS = 64
+
+# 分片map-reduce生成分类体系时使用的提示词
+_MAP_PROMPT_TEMPLATE = """Please propose a partial Computer Science classification system for the following {sample_count} literature samples. This is one shard of a larger library; other shards are analyzed separately and all partial systems will be merged afterwards.
+
+Literature Samples:
+{literature_text}
+
+Propose 3-8 main categories covering the research areas in THIS shard, each with 2-8 subcategories. Use concise professional English names (2-4 words) and one-sentence descriptions.
+
+Please return the partial classification system in JSON format:
+{{
+    "main_categories": {{
+        "category_code": {{
+            "name": "Category Name",
+            "description": "Category Description",
+            "subcategories": {{
+                "subcategory_code": {{
+                    "name": "Subcategory Name",
+                    "description": "Subcategory Description"
+                }}
+            }}
+        }}
+    }}
+}}"""
+
+_REDUCE_PROMPT_TEMPLATE = """The literature library has been analyzed in {shard_count} shards ({sample_count} samples in total). Below are the partial classification systems proposed for each shard. Merge them into ONE comprehensive and well-balanced Computer Science classification system.
+
+Partial Classification Systems:
+{partial_text}
+
+IMPORTANT: Please ensure that your classification system:
+1. Merges duplicate or overlapping categories across shards
+2. Covers ALL significant research areas present in the partial systems
+3. Provides balanced representation across different CS domains
+4. Uses standard Computer Science terminology and naming conventions
+5. Category names should be concise (2-4 words, maximum 5 words)
+6. Create more granular subcategories (4-10 per main category) for better organization
+7. ALL main category names MUST be prefixed with "[AUTO]" (e.g., "[AUTO] AI and Machine Learning Models")
+
+Please return the classification system in JSON format:
+{{
+    "main_categories": {{
+        "category_code": {{
+            "name": "Category Name",
+            "description": "Category Description",
+            "subcategories": {{
+                "subcategory_code": {{
+                    "name": "Subcategory Name",
+                    "description": "Subcategory Description"
+                }}
+            }}
+        }}
+    }}
+}}
+
+Requirements:
+- All category names and descriptions must be in English
+- Maintain clear hierarchical structure with main categories and subcategories
+- ALL main category names MUST be prefixed with "[AUTO]" (e.g., "[AUTO] AI and Machine Learning Models")"""
+
+
+class _MainCategoryStreamScanner:
+    """
+    增量扫描流式输出的分类体系JSON
+    
+    每收到一段文本就继续扫描，main_categories下的某个主分类对象一闭合就返回
+    (分类代码, 该对象的JSON文本)，以便在生成过程中逐个校验
+    """
+    
+    def __init__(self):
+        self.text = ""
+        self.pos = 0
+        self.depth = 0
+        self.in_string = False
+        self.escape = False
+        self.string_start = 0
+        self.top_key = None
+        self.category_code = None
+        self.category_start = None
+    
+    def feed(self, chunk: str) -> List[tuple]:
+        """追加一段输出，返回本段中新闭合的主分类"""
+        self.text += chunk
+        completed = []
+        text = self.text
+        
+        for i in range(self.pos, len(text)):
+            ch = text[i]
+            if self.in_string:
+                if self.escape:
+                    self.escape = False
+                elif ch == '\\':
+                    self.escape = True
+                elif ch == '"':
+                    self.in_string = False
+                    key = text[self.string_start:i]
+                    # depth 1: 顶层字段名；depth 2: main_categories中的分类代码
+                    if self.depth == 1:
+                        self.top_key = key
+                    elif self.depth == 2:
+                        self.category_code = key
+            elif ch == '"':
+                self.in_string = True
+                self.string_start = i + 1
+            elif ch == '{':
+                self.depth += 1
+                if self.depth == 3 and self.top_key == 'main_categories':
+                    self.category_start = i
+            elif ch == '}':
+                if self.depth == 3 and self.category_start is not None:
+                    completed.append((self.category_code, text[self.category_start:i + 1]))
+                    self.category_start = None
+                self.depth -= 1
+        
+        self.pos = len(text)
+        return completed
+
+
+# 定位JSON结构字符：大括号、字符串引号和转义符，其余字符整段跳过
+_JSON_STRUCT_CHAR_RE = re.compile(r'[{}"\\]')
+
+
+def _extract_first_json_object(text: str) -> Optional[str]:
+    """
+    提取文本中第一个完整的JSON对象
+    
+    有```json代码块时从代码块内开始查找；单次扫描并跟踪大括号深度（跳过字符串内的括号和转义），
+    深度回到0即结束，对象之后的说明文字不会被截入；对象未闭合时返回None
+    """
+    fence_idx = text.find('```json')
+    start = text.find('{', fence_idx if fence_idx != -1 else 0)
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    pos = start
+    while True:
+        match = _JSON_STRUCT_CHAR_RE.search(text, pos)
+        if match is None:
+            return None
+        ch = match.group()
+        pos = match.end()
+        if ch == '\\':
+            # 转义符后的字符（如\"）不参与结构判断
+            pos += 1
+        elif ch == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif ch == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return text[start:pos]
+
+
 class SchemaBasedCollectionManager:
     """基于schema的集合管理器"""
     
     def __init__(self, init_llm: bool = True, init_zotero: bool = True):
         """初始化管理器"""
         # 可选初始化LLM和Zotero客户端
+        # 并发创建集合的最大线程数（控制对Zotero API的写入压力，也是连接池大小）
+        self.max_workers = 8
+        
         self.llm_client = self._init_llm_client() if init_llm else None
         self.zotero_client = self._init_zotero_client() if init_zotero else None
         
         self.collection_keys = {}
         
+        # 现有集合缓存：(库版本号, 集合映射, 父集合映射)，库版本未变化时Zotero返回304直接复用
+        # 磁盘缓存按user_id区分文件，并在内容中记录user_id，切换Zotero库后不会复用其他库的集合；
+        # 文件名与001脚本的缓存不同（002额外保存父集合映射），两个脚本互不覆盖
+        self._existing_collections_cache = None
+        self._existing_collection_parents = {}
+        self._zotero_user_id = str(get_zotero_config().user_id)
+        self._collections_cache_file = os.path.join("data", f".collection_tree_cache_{self._zotero_user_id}.json")
+        
+        # schema文件缓存：(路径, 修改时间, 大小) -> 解析结果，摘要和创建集合共用一次解析
+        self._schema_file_cache = {}
+        
+        # 已确认存在的输出目录，每个目录只在首次保存时创建一次
+        self._created_dirs = set()
+        
+        # 本次运行的时间戳，所有默认输出文件名共用，同一次运行的输出文件可按时间戳对应
+        self._run_ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
         # 统计信息
         self.collections_created = 0
     
@@ -124,40 +377,102 @@ class SchemaBasedCollectionManager:
     def _init_zotero_client(self):
         """初始化Zotero客户端"""
         # 使用新的配置系统
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+        
         zotero_config = get_zotero_config()
         
+        # 复用同一个Session的连接池，避免每个请求重新建立TCP/TLS连接
+        # 429/5xx自动重试（POST默认不重试，不会重复创建集合），并遵循Zotero返回的Retry-After
+        session = requests.Session()
+        session.headers.update(zotero_config.headers)
+        retry = Retry(total=5, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers, max_retries=retry)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        
         return {
             'user_id': zotero_config.user_id,
             'api_key': zotero_config.api_key,
             'base_url': zotero_config.api_base_url,
-            'headers': zotero_config.headers
+            'collections_url': f"{zotero_config.api_base_url}/collections",
+            'headers': zotero_config.headers,
+            'session': session
         }
     
+    def _ensure_output_dir(self, filepath: str) -> None:
+        """确保输出文件所在目录存在（不带目录的文件名对应当前目录）"""
+        parent = Path(filepath).parent
+        if parent not in self._created_dirs:
+            parent.mkdir(parents=True, exist_ok=True)
+            self._created_dirs.add(parent)
+    
+    def _get_zotero_client(self) -> Dict[str, Any]:
+        """获取Zotero客户端，未初始化时按需创建"""
+        if self.zotero_client is None:
+            self.zotero_client = self._init_zotero_client()
+        return self.zotero_client
+    
     def _estimate_tokens(self, text: str) -> int:
         """估算token数量（改进版：支持中英文混合文本）"""
         if not text:
             return 0
         
-        # 分离中文字符和英文单词
-        import re
-        
-        # 中文字符（包括中文标点）
-        chinese_chars = re.findall(r'[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]', text)
-        chinese_token_count = len(chinese_chars)
-        
-        # 英文单词和其他字符
-        non_chinese_text = re.sub(r'[\u4e00-\u9fff\u3000-\u303f\uff00-\uffef]', ' ', text)
-        english_words = non_chinese_text.split()
-        english_token_count = len(english_words) * 1.3  # 英文单词按1.3倍计算
+        # 单次扫描：中文字符（包括中文标点）逐个计数，其余按空白分隔的单词计数
+        chinese_token_count = 0
+        english_word_count = 0
+        other_char_count = 0
+        for match in _TOKEN_ESTIMATE_RE.finditer(text):
+            if match.lastindex == 1:
+                chinese_token_count += 1
+            else:
+                english_word_count += 1
+                word = match.group(2)
+                # 其他字符（数字、字母、下划线以外的标点等）只在非纯字母数字的单词中出现
+                if not word.isalnum():
+                    other_char_count += len(_NON_WORD_CHAR_RE.findall(word))
         
-        # 其他字符（数字、标点等）
-        other_chars = re.findall(r'[^\u4e00-\u9fff\u3000-\u303f\uff00-\uffef\s\w]', text)
-        other_token_count = len(other_chars) * 0.5  # 其他字符按0.5倍计算
+        english_token_count = english_word_count * 1.3  # 英文单词按1.3倍计算
+        other_token_count = other_char_count * 0.5  # 其他字符按0.5倍计算
         
         total_tokens = chinese_token_count + english_token_count + other_token_count
         return int(total_tokens)
     
-    def generate_collections_from_literature(self, literature_file: str, max_items: int = None, dry_run: bool = False, return_schema_only: bool = False) -> Dict[str, str]:
+    def _load_literature(self, literature_file: str) -> "pd.DataFrame":
+        """
+        加载文献的标题和摘要（缺少的列按空字符串补齐，与逐行row.get(...)读取时的行为一致）
+        
+        Excel文件解析较慢，首次读取后在同目录写入只含title/abstract两列的Parquet缓存，
+        源文件未修改时直接读取缓存（需要pyarrow，不可用时每次读取Excel）
+        """
+        import pandas as pd
+        
+        columns = ['title', 'abstract']
+        if literature_file.endswith('.parquet'):
+            # read_parquet的columns参数遇到不存在的列会报错，读取全部列后再选取
+            return pd.read_parquet(literature_file).reindex(columns=columns, fill_value='')
+        
+        source = Path(literature_file)
+        cache_file = source.with_name(f"{source.stem}.title_abstract.parquet")
+        if cache_file.exists() and cache_file.stat().st_mtime >= source.stat().st_mtime:
+            try:
+                df = pd.read_parquet(cache_file)
+                logger.info(f"⚡ 使用Parquet缓存: {cache_file}")
+                return df
+            except Exception as e:
+                logger.warning(f"⚠️  读取Parquet缓存失败，重新读取Excel: {e}")
+        
+        # usecols传入列名列表时缺列会报错，用callable只读取存在的列
+        df = pd.read_excel(literature_file, usecols=lambda c: c in columns).reindex(columns=columns, fill_value='')
+        try:
+            df.to_parquet(cache_file, index=False, compression='zstd')
+        except Exception as e:
+            logger.debug(f"写入Parquet缓存失败（可能未安装pyarrow）: {e}")
+        return df
+    
+    def generate_collections_from_literature(self, literature_file: str, max_items: int = None, dry_run: bool = False, return_schema_only: bool = False,
+                                             map_reduce: bool = False, assume_yes: bool = False, max_cost_usd: float = None) -> Dict[str, str]:
         # 使用配置系统获取默认值
         if max_items is None:
             max_items = get_default_max_items()
@@ -169,7 +484,7 @@ class SchemaBasedCollectionManager:
         
         # 加载文献数据
         try:
-            df = pd.read_excel(literature_file)
+            df = self._load_literature(literature_file)
             logger.info(f"✅ 成功加载文献数据: {len(df)} 篇文献")
         except Exception as e:
             logger.error(f"❌ 加载文献数据失败: {e}")
@@ -179,14 +494,18 @@ class SchemaBasedCollectionManager:
         logger.info(f"📊 将分析所有 {len(df)} 篇文献来生成分类")
         
         # 获取现有集合（仅在非测试模式下）
-        existing_collections = {}
+        # 在后台线程中请求Zotero，与样本准备和LLM生成重叠，创建集合前再取结果
+        existing_future = None
         if not return_schema_only:
-            existing_collections = self._get_existing_collections()
+            executor = ThreadPoolExecutor(max_workers=1)
+            existing_future = executor.submit(self._get_existing_collections)
+            executor.shutdown(wait=False)
         
         if dry_run:
+            existing_collections = existing_future.result() if existing_future is not None else {}
             print(f"\n📊 LLM生成集合计划:")
             print(f"分析文献数: {len(df)} 篇")
-            print(f"现有集合: {len(existing_collections)} 个")
+            print(f"现有集合: {len(existing_collections)} 个" if existing_collections is not None else "现有集合: 获取失败")
             print(f"预计LLM调用: 1次（生成分类体系）")
             print("\n📋 分析内容:")
             print(f"- 文献标题和摘要")
@@ -196,13 +515,15 @@ class SchemaBasedCollectionManager:
             return {}
         
         # 准备所有文献样本用于LLM分析（使用更长的摘要）
+        # 空单元格先填充为空字符串，避免NaN被str()成'nan'而混入样本
         literature_samples = []
-        for idx, row in df.iterrows():
-            title = str(row.get('title', '')).strip()
-            abstract = str(row.get('abstract', '')).strip()
+        text_df = df.reindex(columns=['title', 'abstract']).fillna('')
+        for title, abstract in text_df.itertuples(index=False, name=None):
+            title = str(title).strip()
+            abstract = str(abstract).strip()
             
             if title and abstract:
-                # 保留完整摘要，不截断，让LLM获得更多信息
+                # 保留完整摘要，让LLM获得更多信息（超出token预算时再截断最长的摘要）
                 literature_samples.append({
                     'title': title,
                     'abstract': abstract
@@ -212,19 +533,33 @@ class SchemaBasedCollectionManager:
             logger.error("❌ 没有找到有效的文献样本")
             return {}
         
+        # 预印本与正式发表版本等重复摘要对分类体系没有帮助，只会增加输入token
+        literature_samples = self._deduplicate_samples(literature_samples)
+        
         # 创建LLM提示词来生成分类体系
         system_prompt = """You are a professional academic literature classification expert specializing in Computer Science and related fields. Your task is to design a comprehensive and well-balanced classification system based on the provided literature samples.\n\nPlease carefully analyze ALL titles and abstracts in the literature samples to identify the complete spectrum of research areas, technical topics, and disciplinary directions. Pay special attention to:\n\n1. **Comprehensive Coverage**: Ensure the classification covers ALL major research areas present in the literature, including but not limited to:\n   - AI/ML (Foundation Models, LLMs, MLLMs, Computer Vision, etc.)\n   - Traditional Systems (Distributed Systems, Operating Systems, Database Systems, etc.)\n   - AI Systems (Training Frameworks, Inference Frameworks, GPU Optimaztions, Attention Optimaztions, etc.)\n   - Scientific Computing (HPC, Physics, Chemistry, Biology applications, etc.)\n   - Graphics and Visualization (3D rendering, 3DGS, NeRF, Computer Graphics, etc.)\n   - Programming Languages and Software Engineering\n   - Infras (Networks, Storage, Security, DataCenters etc.)\n   - Any other CS domains present in the literature\n\n2. **Balanced Representation**: Ensure that all significant research areas in the literature are represented proportionally, without over-emphasizing any single domain.\n\n3. **Hierarchical Structure**: Create a logical two-level hierarchy where:\n   - Main categories represent broad CS research domains\n   - Subcategories represent specific technical directions within each domain\n\n4. **Professional Standards**: Use standard CS terminology and naming conventions that would be recognized by the academic community.\n\nClassification System Requirements:\n1. Main Categories: 8-15 major Computer Science research domains\n2. Subcategories: Each main category must have 4-10 specific technical directions (aim for more granular subcategories)\n3. Category Names: Concise, professional English names using 2-4 words maximum (never exceed 5 words), using standard CS terminology. IMPORTANT: All main category names must be prefixed with "[AUTO]" (e.g., "[AUTO] AI and Machine Learning Models")\n4. Category Descriptions: Clear, accurate descriptions of research scope and content\n5. Coverage: Ensure ALL significant research areas from the literature are covered\n6. Balance: Avoid over-representing any single domain while ensuring comprehensive coverage\n\nPlease return the classification system in JSON format:"""
 
         # 构建完整的文献文本（使用所有文献）
-        literature_text = ""
-        for i, sample in enumerate(literature_samples):
-            literature_text += f"{i+1}. 标题：{sample['title']}\n   摘要：{sample['abstract']}\n\n"
+        literature_text = self._build_literature_text(literature_samples)
 
-        user_prompt = f"""Please design a comprehensive and well-balanced Computer Science classification system based on the following {len(literature_samples)} literature samples.\n\nLiterature Samples:\n{literature_text}\n\nIMPORTANT: Please ensure that your classification system:\n1. Covers ALL significant research areas present in the literature samples\n2. Provides balanced representation across different CS domains\n3. Includes specific categories for any specialized research areas (e.g., High Energy Physics, Scientific Computing, etc.)\n4. Uses standard Computer Science terminology and naming conventions\n5. Category names should be concise (2-4 words, maximum 5 words)\n6. Create more granular subcategories (4-10 per main category) for better organization\n7. ALL main category names MUST be prefixed with "[AUTO]" (e.g., "[AUTO] AI and Machine Learning Models")\n\nPlease return the classification system in JSON format:\n{{\n    "main_categories": {{\n        "category_code": {{\n            "name": "Category Name",\n            "description": "Category Description",\n            "subcategories": {{\n                "subcategory_code": {{\n                    "name": "Subcategory Name", \n                    "description": "Subcategory Description"\n                }}\n            }}\n        }}\n    }}\n}}\n\nRequirements:\n- All category names and descriptions must be in English\n- Use professional Computer Science terminology\n- Ensure comprehensive coverage of ALL research areas in the literature\n- Maintain clear hierarchical structure with main categories and subcategories\n- Focus on Computer Science domains while including interdisciplinary applications\n- Category names must be concise (2-4 words, never exceed 5 words)\n- Create more granular subcategories (3-6 per main category) for better organization\n- ALL main category names MUST be prefixed with "[AUTO]" (e.g., "[AUTO] AI and Machine Learning Models")"""
+        user_prompt = _USER_PROMPT_TEMPLATE.format(sample_count=len(literature_samples), literature_text=literature_text)
         
         # 计算token使用量
         total_prompt = system_prompt + "\n\n" + user_prompt
         estimated_tokens = self._estimate_tokens(total_prompt)
+        
+        # 超过token限制时，优先只截断最长的摘要使提示词落入预算，仍能一次调用完成
+        max_tokens_limit = get_max_tokens_limit()
+        if estimated_tokens > max_tokens_limit and not map_reduce:
+            prompt_overhead = estimated_tokens - self._estimate_tokens(literature_text)
+            fitted_samples = self._truncate_abstracts_to_budget(literature_samples, max_tokens_limit - prompt_overhead)
+            if fitted_samples is not None:
+                literature_samples = fitted_samples
+                literature_text = self._build_literature_text(literature_samples)
+                user_prompt = _USER_PROMPT_TEMPLATE.format(sample_count=len(literature_samples), literature_text=literature_text)
+                truncated_tokens = self._estimate_tokens(system_prompt + "\n\n" + user_prompt)
+                logger.info(f"✂️  截断过长摘要: 估算输入tokens {estimated_tokens:,} -> {truncated_tokens:,}")
+                estimated_tokens = truncated_tokens
         # 简单的成本估算（美元）
         input_cost = (estimated_tokens / 1000) * 0.0035
         default_output_tokens = get_default_output_tokens()
@@ -238,15 +573,23 @@ class SchemaBasedCollectionManager:
         logger.info(f"  总tokens: ~{estimated_tokens + default_output_tokens:,}")
         logger.info(f"  估算成本: ${estimated_cost:.4f}")
         
-        # 检查token限制
-        max_tokens_limit = get_max_tokens_limit()
+        # 检查token限制，截断后仍超过限制时改为分片map-reduce方式
         if estimated_tokens > max_tokens_limit:
             logger.warning(f"⚠️  估算token数量 ({estimated_tokens:,}) 超过{max_tokens_limit:,}限制")
-            logger.info("建议减少文献数量或截断摘要")
+            logger.info("🔀 改用分片map-reduce方式生成分类体系")
+            map_reduce = True
+        
+        # 成本上限：超出时直接放弃，不发起LLM调用
+        if max_cost_usd is not None and estimated_cost > max_cost_usd:
+            logger.error(f"❌ 估算成本 ${estimated_cost:.4f} 超过上限 ${max_cost_usd:.4f}，未调用LLM")
             return {}
         
-        # 用户确认（仅在非dry_run且非return_schema_only时）
-        if not dry_run and not return_schema_only:
+        # 估算成本未超过--max-cost-usd上限时视为已确认
+        if max_cost_usd is not None and estimated_cost <= max_cost_usd:
+            assume_yes = True
+        
+        # 用户确认（仅在非dry_run且非return_schema_only时，--yes或成本在上限内时跳过）
+        if not dry_run and not return_schema_only and not assume_yes:
             print(f"\n📊 LLM请求估算:")
             print(f"  分析文献数: {len(literature_samples)} 篇")
             print(f"  估算输入tokens: {estimated_tokens:,}")
@@ -254,21 +597,26 @@ class SchemaBasedCollectionManager:
             print(f"  总tokens: {estimated_tokens + default_output_tokens:,}")
             print(f"  估算成本: ${estimated_cost:.4f}")
             
+            # 非交互环境（cron、CI）中没有终端可以确认，直接放弃而不是阻塞
+            if not sys.stdin.isatty():
+                logger.error("❌ 非交互环境无法确认，请使用 --yes 跳过确认")
+                return {}
+            
             confirm = input("\n是否继续执行？(y/N): ").strip().lower()
             if confirm != 'y':
                 logger.info("用户取消操作")
                 return {}
 
-        # 调用LLM生成分类体系
+        # 调用LLM生成分类体系（流式输出，每个主分类生成完毕即校验）
         try:
-            response = self.llm_client.generate(
-                prompt=user_prompt,
-                system_prompt=system_prompt,
-                max_tokens=default_output_tokens,
-                temperature=0.3
-            )
+            if map_reduce:
+                content = self._generate_schema_map_reduce(literature_samples, system_prompt, default_output_tokens)
+            else:
+                content = self._generate_schema_streaming(user_prompt, system_prompt, default_output_tokens)
+            if not content:
+                return {}
             # 解析LLM响应
-            classification_system = self._parse_classification_system(response.get('content', ''))
+            classification_system = self._parse_classification_system(content)
             if not classification_system:
                 logger.error("❌ LLM生成的分类体系解析失败")
                 return {}
@@ -283,25 +631,220 @@ class SchemaBasedCollectionManager:
             # 如果只需要返回分类体系，不创建集合
             if return_schema_only:
                 return classification_system
-            # 创建集合
-            return self._create_collections_from_llm_system(classification_system, existing_collections, dry_run)
+            # 创建集合（现有集合获取失败时不创建，避免把已有集合重复创建一遍）
+            existing_collections = existing_future.result()
+            if existing_collections is None:
+                logger.error("❌ 无法获取完整的现有集合列表，已放弃创建集合，避免重复创建已有集合")
+                # 保存已生成的分类体系，稍后可用--create-collections重试，无需再次调用LLM
+                saved_file = self.save_ready_schema(classification_system)
+                if saved_file:
+                    logger.info(f"💡 稍后重试: --create-collections --schema {saved_file}")
+                return {}
+            created = self._create_collections_from_llm_system(classification_system, existing_collections, dry_run)
+            if not created:
+                return {}
+            collection_mapping, total_created = created
+            return self._save_schema_with_collection_keys(classification_system, collection_mapping, total_created)
         except Exception as e:
             logger.error(f"❌ LLM生成分类体系失败: {e}")
             return {}
     
+    def _deduplicate_samples(self, literature_samples: List[Dict[str, str]], threshold: float = 0.85) -> List[Dict[str, str]]:
+        """
+        合并重复和近似重复的摘要，每组只保留第一篇
+        
+        摘要按小写单词归一化后完全相同的直接去重；安装了datasketch时再用MinHash LSH
+        合并Jaccard相似度不低于threshold的近似重复摘要
+        """
+        try:
+            from datasketch import MinHash, MinHashLSH
+        except ImportError:
+            MinHashLSH = None
+        
+        lsh = MinHashLSH(threshold=threshold, num_perm=64) if MinHashLSH is not None else None
+        seen = set()
+        unique_samples = []
+        for idx, sample in enumerate(literature_samples):
+            words = _WORD_TOKEN_RE.findall(sample['abstract'].lower())
+            normalized = " ".join(words)
+            if normalized in seen:
+                continue
+            
+            if lsh is not None:
+                minhash = MinHash(num_perm=64)
+                for word in set(words):
+                    minhash.update(word.encode('utf-8'))
+                if lsh.query(minhash):
+                    continue
+                lsh.insert(str(idx), minhash)
+            
+            seen.add(normalized)
+            unique_samples.append(sample)
+        
+        if len(unique_samples) < len(literature_samples):
+            logger.info(f"♻️  合并重复摘要: {len(literature_samples)} -> {len(unique_samples)} 篇")
+        return unique_samples
+    
+    def _build_literature_text(self, literature_samples: List[Dict[str, str]]) -> str:
+        """将文献样本拼接为提示词中的编号列表（一次join避免逐条拼接的二次复制）"""
+        return "".join(
+            f"{i}. 标题：{sample['title']}\n   摘要：{sample['abstract']}\n\n"
+            for i, sample in enumerate(literature_samples, 1)
+        )
+    
+    def _truncate_abstracts_to_budget(self, literature_samples: List[Dict[str, str]], token_budget: int) -> Optional[List[Dict[str, str]]]:
+        """
+        按token预算截断摘要，返回新的样本列表
+        
+        采用"注水"方式求统一的摘要token上限：短于上限的摘要保持完整，只截断最长的那些；
+        截断后的摘要低于_MIN_ABSTRACT_TOKENS时返回None，交由调用方改用分片map-reduce
+        """
+        entry_tokens = [self._estimate_tokens(self._build_literature_text([{'title': sample['title'], 'abstract': ''}]))
+                        for sample in literature_samples]
+        abstract_tokens = [self._estimate_tokens(sample['abstract']) for sample in literature_samples]
+        
+        # 逐条估算时每条最多向下取整少算1个token，预先扣除
+        remaining = token_budget - sum(entry_tokens) - len(literature_samples)
+        pending = len(literature_samples)
+        if pending == 0 or remaining < _MIN_ABSTRACT_TOKENS * pending:
+            return None
+        
+        # 从短到长依次"注水"，剩余预算平均分给尚未分配的摘要，第一个放不下的摘要决定上限
+        cap = None
+        for tokens in sorted(abstract_tokens):
+            share = remaining // pending
+            if tokens > share:
+                cap = share
+                break
+            remaining -= tokens
+            pending -= 1
+        if cap is None:
+            return literature_samples
+        
+        fitted_samples = []
+        for sample, tokens in zip(literature_samples, abstract_tokens):
+            abstract = sample['abstract']
+            if tokens > cap:
+                # 估算token与字符数大致成正比，按比例截断字符
+                abstract = abstract[:len(abstract) * cap // tokens].rstrip()
+            fitted_samples.append({'title': sample['title'], 'abstract': abstract})
+        return fitted_samples
+    
+    def _shard_samples(self, literature_samples: List[Dict[str, str]], shard_tokens: int = 6000) -> List[List[Dict[str, str]]]:
+        """按估算token数将文献样本切分为多个分片"""
+        shards = []
+        current = []
+        current_tokens = 0
+        for sample in literature_samples:
+            sample_tokens = self._estimate_tokens(sample['title']) + self._estimate_tokens(sample['abstract'])
+            if current and current_tokens + sample_tokens > shard_tokens:
+                shards.append(current)
+                current = []
+                current_tokens = 0
+            current.append(sample)
+            current_tokens += sample_tokens
+        if current:
+            shards.append(current)
+        return shards
+    
+    def _generate_schema_map_reduce(self, literature_samples: List[Dict[str, str]], system_prompt: str, max_tokens: int) -> str:
+        """
+        分片map-reduce生成分类体系
+        
+        map：每个分片并发生成局部分类体系；reduce：只把各分片的分类名称和描述交给LLM合并，
+        输入token与文献总量基本无关
+        """
+        shards = self._shard_samples(literature_samples)
+        logger.info(f"🔀 map阶段: {len(literature_samples)} 篇文献分为 {len(shards)} 个分片并发生成局部分类体系")
+        
+        map_prompts = []
+        for shard in shards:
+            literature_text = self._build_literature_text(shard)
+            map_prompts.append(_MAP_PROMPT_TEMPLATE.format(sample_count=len(shard), literature_text=literature_text))
+        
+        responses = self.llm_client.generate_texts(map_prompts, system_prompt=system_prompt, max_tokens=max_tokens, temperature=0.3)
+        
+        # 汇总各分片的分类名称和描述
+        partial_lines = []
+        for shard_idx, response in enumerate(responses, 1):
+            if isinstance(response, Exception):
+                logger.warning(f"⚠️  分片 {shard_idx} 生成失败: {response}")
+                continue
+            partial_system = self._parse_classification_system(response or "")
+            if not partial_system:
+                logger.warning(f"⚠️  分片 {shard_idx} 的局部分类体系解析失败")
+                continue
+            
+            partial_lines.append(f"Shard {shard_idx}:")
+            for main_cat in partial_system.get('main_categories', {}).values():
+                partial_lines.append(f"- {main_cat.get('name', '')}: {main_cat.get('description', '')}")
+                for sub_cat in main_cat.get('subcategories', {}).values():
+                    partial_lines.append(f"  - {sub_cat.get('name', '')}: {sub_cat.get('description', '')}")
+        
+        if not partial_lines:
+            logger.error("❌ 所有分片都未能生成局部分类体系")
+            return ""
+        
+        logger.info(f"🔀 reduce阶段: 合并 {len(shards)} 个局部分类体系")
+        reduce_prompt = _REDUCE_PROMPT_TEMPLATE.format(
+            shard_count=len(shards),
+            sample_count=len(literature_samples),
+            partial_text="\n".join(partial_lines)
+        )
+        return self._generate_schema_streaming(reduce_prompt, system_prompt, max_tokens)
+    
+    def _generate_schema_streaming(self, user_prompt: str, system_prompt: str, max_tokens: int) -> str:
+        """流式生成分类体系，主分类结构不合法时立即中止生成，返回完整响应文本"""
+        scanner = _MainCategoryStreamScanner()
+        parts = []
+        start_time = time.time()
+        first_token_time = None
+        
+        stream = self.llm_client.generate_stream(
+            prompt=user_prompt,
+            system_prompt=system_prompt,
+            max_tokens=max_tokens,
+            temperature=0.3
+        )
+        try:
+            for chunk in stream:
+                if first_token_time is None:
+                    first_token_time = time.time()
+                    logger.info(f"⏱️  首个token耗时: {first_token_time - start_time:.1f}秒")
+                parts.append(chunk)
+                
+                for code, category_json in scanner.feed(chunk):
+                    try:
+                        # JSON解析和结构校验在pydantic-core中一次完成
+                        _MAIN_CATEGORY_ADAPTER.validate_json(category_json)
+                    except ValueError as e:
+                        # ValidationError是ValueError的子类
+                        logger.error(f"❌ 主分类 {code} 结构不合法，中止生成: {e}")
+                        return ""
+                    logger.info(f"📥 主分类 {code} 已生成 ({time.time() - start_time:.1f}秒)")
+        finally:
+            stream.close()
+        
+        logger.info(f"✅ 分类体系生成完成，总耗时: {time.time() - start_time:.1f}秒")
+        return "".join(parts)
+    
     def _parse_classification_system(self, response: str) -> Dict[str, Any]:
         """解析LLM生成的分类体系"""
         try:
-            # 尝试提取JSON部分
-            start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
-                logger.error("无法找到JSON格式的分类体系")
+            # 提取第一个完整的JSON对象（忽略代码块标记和前后的说明文字）
+            json_str = _extract_first_json_object(response)
+            if json_str is None:
+                logger.error("无法找到完整JSON格式的分类体系")
                 return {}
             
-            json_str = response[start_idx:end_idx]
-            classification_system = json.loads(json_str)
+            # 优先让pydantic-core一次完成JSON解析和结构校验
+            try:
+                return _SCHEMA_ADAPTER.validate_json(json_str)
+            except ValidationError as e:
+                logger.debug(f"分类体系结构校验未通过，按普通JSON解析: {e}")
+            
+            # 结构不完整时仍返回原始JSON，由verify_schema给出具体的校验错误
+            classification_system = orjson.loads(json_str) if orjson is not None else json.loads(json_str)
             
             # 验证结构
             if 'main_categories' not in classification_system:
@@ -320,13 +863,11 @@ class SchemaBasedCollectionManager:
     def save_llm_generated_schema(self, classification_system: Dict[str, Any], output_file: str = None) -> str:
         """保存LLM生成的原始schema"""
         if output_file is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"data/llm_generated_schema_{timestamp}.json"
+            output_file = f"data/llm_generated_schema_{self._run_ts}.json"
         
         try:
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(classification_system, f, ensure_ascii=False, indent=2)
+            self._ensure_output_dir(output_file)
+            _write_json_file(output_file, classification_system)
             
             logger.info(f"✅ LLM生成的schema已保存到: {output_file}")
             return output_file
@@ -336,9 +877,8 @@ class SchemaBasedCollectionManager:
     
     def save_ready_schema(self, classification_system: Dict[str, Any]) -> str:
         """保存为ready状态的schema文件（第一步输出）"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        output_file = f"data/classification_schema_ready_{timestamp}.json"
-        excel_output_file = f"data/classification_schema_ready_{timestamp}.xlsx"
+        output_file = f"data/classification_schema_ready_{self._run_ts}.json"
+        excel_output_file = f"data/classification_schema_ready_{self._run_ts}.xlsx"
         
         # 计算统计信息
         main_categories = classification_system.get('main_categories', {})
@@ -362,9 +902,8 @@ class SchemaBasedCollectionManager:
         }
         
         try:
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(ready_schema, f, ensure_ascii=False, indent=2)
+            self._ensure_output_dir(output_file)
+            _write_json_file(output_file, ready_schema)
             
             logger.info(f"✅ Ready schema已保存到: {output_file}")
             
@@ -377,77 +916,85 @@ class SchemaBasedCollectionManager:
             return ""
 
     def _save_schema_to_excel(self, classification_system: Dict[str, Any], excel_output_file: str):
-        """将生成的schema保存到Excel文件"""
+        """将生成的schema保存到Excel文件（优先使用xlsxwriter逐行写出，未安装时使用pandas+openpyxl）"""
         try:
-            import pandas as pd
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-
-            excel_data = []
+            columns = [
+                'main_category_code', 'main_category_name', 'main_category_description',
+                'subcategory_code', 'subcategory_name', 'subcategory_description'
+            ]
+            column_widths = [20, 40, 60, 20, 40, 60]
+            
+            rows = []
             main_categories = classification_system.get('main_categories', {})
 
             for main_cat_code, main_cat_info in main_categories.items():
+                main_values = [main_cat_code, main_cat_info.get('name', ''), main_cat_info.get('description', '')]
                 subcategories = main_cat_info.get('subcategories', {})
                 if subcategories:
                     for sub_cat_code, sub_cat_info in subcategories.items():
-                        row_data = {
-                            'main_category_code': main_cat_code,
-                            'main_category_name': main_cat_info.get('name', ''),
-                            'main_category_description': main_cat_info.get('description', ''),
-                            'subcategory_code': sub_cat_code,
-                            'subcategory_name': sub_cat_info.get('name', ''),
-                            'subcategory_description': sub_cat_info.get('description', '')
-                        }
-                        excel_data.append(row_data)
+                        rows.append(main_values + [sub_cat_code, sub_cat_info.get('name', ''), sub_cat_info.get('description', '')])
                 else:
-                    row_data = {
-                        'main_category_code': main_cat_code,
-                        'main_category_name': main_cat_info.get('name', ''),
-                        'main_category_description': main_cat_info.get('description', ''),
-                        'subcategory_code': '',
-                        'subcategory_name': '',
-                        'subcategory_description': ''
-                    }
-                    excel_data.append(row_data)
-
-            df = pd.DataFrame(excel_data)
-
-            with pd.ExcelWriter(excel_output_file, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Classification Schema', index=False)
-                worksheet = writer.sheets['Classification Schema']
-
-                # 设置列宽
-                column_widths = {
-                    'A': 20,
-                    'B': 40,
-                    'C': 60,
-                    'D': 20,
-                    'E': 40,
-                    'F': 60,
-                }
-                for col, width in column_widths.items():
-                    worksheet.column_dimensions[col].width = width
-
-                # 设置标题行样式
-                header_font = Font(bold=True, color="FFFFFF")
-                header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-                header_alignment = Alignment(horizontal="center", vertical="center")
-
-                for cell in worksheet[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
-
-                # 设置数据行样式
-                for row in worksheet.iter_rows(min_row=2):
-                    for cell in row:
-                        cell.alignment = Alignment(wrap_text=True, vertical="top")
+                    rows.append(main_values + ['', '', ''])
+
+            try:
+                import xlsxwriter
+            except ImportError:
+                xlsxwriter = None
+            
+            if xlsxwriter is not None:
+                # constant_memory模式逐行写出，格式对象由xlsxwriter统一管理，无需逐个单元格设置样式
+                workbook = xlsxwriter.Workbook(excel_output_file, {'constant_memory': True})
+                try:
+                    worksheet = workbook.add_worksheet('Classification Schema')
+                    header_format = workbook.add_format({
+                        'bold': True, 'font_color': 'white', 'bg_color': '#366092',
+                        'align': 'center', 'valign': 'vcenter'
+                    })
+                    wrap_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+                    
+                    for col_idx, width in enumerate(column_widths):
+                        worksheet.set_column(col_idx, col_idx, width)
+                    worksheet.write_row(0, 0, columns, header_format)
+                    for row_idx, row in enumerate(rows, start=1):
+                        worksheet.write_row(row_idx, 0, row, wrap_format)
+                finally:
+                    workbook.close()
+            else:
+                import pandas as pd
+                from openpyxl.styles import Font, PatternFill, Alignment
+                from openpyxl.utils import get_column_letter
+                
+                df = pd.DataFrame(rows, columns=columns)
+
+                with pd.ExcelWriter(excel_output_file, engine='openpyxl') as writer:
+                    df.to_excel(writer, sheet_name='Classification Schema', index=False)
+                    worksheet = writer.sheets['Classification Schema']
+
+                    # 设置列宽
+                    for col_idx, width in enumerate(column_widths, start=1):
+                        worksheet.column_dimensions[get_column_letter(col_idx)].width = width
+
+                    # 设置标题行样式
+                    header_font = Font(bold=True, color="FFFFFF")
+                    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+                    header_alignment = Alignment(horizontal="center", vertical="center")
+
+                    for cell in worksheet[1]:
+                        cell.font = header_font
+                        cell.fill = header_fill
+                        cell.alignment = header_alignment
+
+                    # 设置数据行样式（共用同一个Alignment对象）
+                    data_alignment = Alignment(wrap_text=True, vertical="top")
+                    for row in worksheet.iter_rows(min_row=2):
+                        for cell in row:
+                            cell.alignment = data_alignment
 
             logger.info(f"✅ Schema已导出到Excel文件: {excel_output_file}")
 
         except ImportError as e:
             logger.warning(f"⚠️ 无法生成Excel文件，缺少依赖: {e}")
-            logger.info("请安装: pip install pandas openpyxl")
+            logger.info("请安装: pip install xlsxwriter（或 pandas openpyxl）")
         except Exception as e:
             logger.error(f"❌ 生成Excel文件失败: {e}")
     
@@ -476,11 +1023,18 @@ class SchemaBasedCollectionManager:
         
         return preview
     
+    def _load_schema_file(self, schema_file: str) -> Dict[str, Any]:
+        """读取schema文件，文件未修改时复用上次的解析结果"""
+        stat = os.stat(schema_file)
+        cache_key = (os.path.abspath(schema_file), stat.st_mtime_ns, stat.st_size)
+        if cache_key not in self._schema_file_cache:
+            self._schema_file_cache[cache_key] = _read_json_file(schema_file)
+        return self._schema_file_cache[cache_key]
+    
     def get_operation_summary(self, schema_file: str) -> Dict[str, Any]:
         """获取操作摘要信息"""
         try:
-            with open(schema_file, 'r', encoding='utf-8') as f:
-                schema_data = json.load(f)
+            schema_data = self._load_schema_file(schema_file)
             
             classification_system = schema_data.get('classification_schema', {})
             main_categories = classification_system.get('main_categories', {})
@@ -501,241 +1055,376 @@ class SchemaBasedCollectionManager:
         """从ready schema创建集合（第二步）"""
         try:
             # 读取ready schema
-            with open(schema_file, 'r', encoding='utf-8') as f:
-                schema_data = json.load(f)
+            schema_data = self._load_schema_file(schema_file)
             
             classification_system = schema_data.get('classification_schema', {})
             if not classification_system:
                 logger.error("❌ Schema文件中没有找到分类体系")
                 return ""
             
-            # 获取现有集合
-            existing_collections = self._get_existing_collections()
+            # 获取现有集合；未初始化Zotero客户端的干运行只读磁盘缓存，不发起网络请求
+            if dry_run and self.zotero_client is None:
+                existing_collections = self._get_cached_collections_offline()
+            else:
+                existing_collections = self._get_existing_collections()
+            if existing_collections is None:
+                if not dry_run:
+                    logger.error("❌ 无法获取完整的现有集合列表，已放弃创建集合，避免重复创建已有集合")
+                    return ""
+                logger.warning("⚠️  无法获取现有集合，预览将按全部新建显示")
+                existing_collections = {}
             
             # 创建集合
-            collection_keys = self._create_collections_from_llm_system(
+            created = self._create_collections_from_llm_system(
                 classification_system, 
                 existing_collections, 
                 dry_run=dry_run
             )
+            if dry_run:
+                return ""
             
-            if not collection_keys:
+            if not created or not created[0]:
                 logger.error("❌ 创建集合失败")
                 return ""
             
             # 保存带collection keys的完整schema
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"data/schema_with_collection_keys_{timestamp}.json"
-            
-            # 构建完整schema
-            complete_schema = {
-            "metadata": {
-                    "created_at": datetime.now().isoformat(),
-                    "status": "collections_created",
-                    "source_file": schema_file,
-                    "total_collections_created": len(collection_keys)
-                },
-                "classification_schema": classification_system,
-                "collection_mapping": collection_keys
-            }
-            try:
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(complete_schema, f, ensure_ascii=False, indent=2)
-            
-                logger.info(f"✅ 完整schema已保存到: {output_file}")
-            except Exception as e:
-                logger.error(f"❌ 保存schema失败: {e}")
+            collection_mapping, total_created = created
+            return self._save_schema_with_collection_keys(classification_system, collection_mapping, total_created, source_file=schema_file)
         except Exception as e:
             logger.error(f"❌ 从ready schema创建集合失败: {e}")
             return ""
     
-    def _create_collections_from_llm_system(self, classification_system: Dict[str, Any], existing_collections: Dict[str, str], dry_run: bool = False) -> Dict[str, str]:
-        """从LLM生成的分类体系创建集合"""
+    def _save_schema_with_collection_keys(self, classification_system: Dict[str, Any], collection_mapping: Dict[str, str],
+                                          total_created: int, source_file: str = None) -> str:
+        """保存带collection_key的完整schema（每次创建集合只写一次），返回文件路径"""
+        output_file = f"data/schema_with_collection_keys_{self._run_ts}.json"
+        
+        metadata = {
+            "created_at": datetime.now().isoformat(),
+            "status": "collections_created",
+            "total_collections_created": total_created
+        }
+        if source_file:
+            metadata["source_file"] = source_file
+        complete_schema = {
+            "metadata": metadata,
+            "classification_schema": classification_system,
+            "collection_mapping": collection_mapping
+        }
+        
+        try:
+            self._ensure_output_dir(output_file)
+            _write_json_file(output_file, complete_schema)
+        except Exception as e:
+            logger.error(f"❌ 保存schema失败: {e}")
+            return ""
+        
+        logger.info(f"📁 更新后的schema已保存到: {output_file}")
+        return output_file
+    
+    def _flatten_schema_by_depth(self, classification_system: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """
+        按层级展开分类体系（广度优先），返回每一层的节点列表
+        
+        节点id为分类代码路径（如('ai',)、('ai', 'llm')），data为schema中对应的dict，用于写回collection_key
+        """
+        levels = []
+        current = [
+            {'id': (code,), 'parent_id': None, 'name': data.get('name', ''), 'data': data}
+            for code, data in classification_system.get('main_categories', {}).items()
+        ]
+        while current:
+            levels.append(current)
+            current = [
+                {'id': node['id'] + (sub_code,), 'parent_id': node['id'], 'name': sub_data.get('name', ''), 'data': sub_data}
+                for node in current
+                for sub_code, sub_data in node['data'].get('subcategories', {}).items()
+            ]
+        return levels
+    
+    def _create_collections_from_llm_system(self, classification_system: Dict[str, Any], existing_collections: Dict[str, str],
+                                            dry_run: bool = False) -> Optional[Tuple[Dict[str, str], int]]:
+        """
+        从LLM生成的分类体系创建集合
+        
+        逐层批量创建：父层全部创建完成后，下一层才能带上parentCollection；同一父集合下已有同名集合时直接复用。
+        collection_key直接写回classification_system，返回(主分类代码到集合key的映射, 新创建的集合数)；
+        干运行或没有主分类时返回None，schema文件由调用方统一保存
+        """
         main_categories = classification_system.get('main_categories', {})
         
         if not main_categories:
             logger.error("❌ 分类体系中没有主分类")
-            return {}
+            return None
         
-        # 获取现有集合的名称和key映射
-        existing_names = {name: key for key, name in existing_collections.items()}
-        existing_keys = {name: key for key, name in existing_collections.items()}
+        # 现有集合按(父集合key, 名称)索引，顶层集合的父集合为None
+        existing_parents = self._existing_collection_parents
+        existing_by_parent = {(existing_parents.get(key), name): key for key, name in existing_collections.items()}
         
         logger.info(f"📊 开始创建集合:")
         logger.info(f"   主分类数: {len(main_categories)}")
         logger.info(f"   现有集合: {len(existing_collections)}")
         
-        # 创建主分类集合
-        logger.info(f"🎯 创建主分类集合:")
-        main_collections = {}
-        created_main = 0
-        all_collection_keys = {}
-
-        for category_code, category_data in main_categories.items():
-            category_name = category_data["name"]
-            
+        levels = self._flatten_schema_by_depth(classification_system)
+        collection_keys = {}  # 节点id -> 集合key
+        total_created = 0
+        
+        for depth, level in enumerate(levels):
+            level_label = "主分类" if depth == 0 else "子分类"
+            logger.info(f"🎯 创建{level_label}集合:")
+            created = 0
+            skipped = 0
+            pending = []
             
+            for node in level:
+                is_root = node['parent_id'] is None
+                parent_key = None if is_root else collection_keys.get(node['parent_id'])
+                if not is_root and parent_key is None:
+                    if dry_run:
+                        logger.info(f"🔍 [干运行] 将创建{level_label}: {node['name']}")
+                    else:
+                        logger.error(f"❌ 无法创建{level_label} {node['name']} - 父分类不存在")
+                    continue
+                
+                existing_key = existing_by_parent.get((parent_key, node['name']))
+                if existing_key:
+                    collection_keys[node['id']] = existing_key
+                    skipped += 1
+                    logger.info(f"⏭️  {level_label}已存在，跳过: {node['name']} (key: {existing_key})")
+                    if not dry_run:
+                        node['data']['collection_key'] = existing_key
+                elif dry_run:
+                    logger.info(f"🔍 [干运行] 将创建{level_label}: {node['name']}")
+                else:
+                    pending.append((node, parent_key))
             
-            if dry_run:
-                logger.info(f"🔍 [干运行] 将创建主分类: {category_name}")
-            else:
-                collection_key = self._create_collection(category_name, category_data.get("description", ""))
+            # 同一层的集合互不依赖，一起批量创建
+            created_keys = self._create_collections_batch([(node['name'], parent_key) for node, parent_key in pending]) if pending else {}
+            for idx, (node, _) in enumerate(pending):
+                collection_key = created_keys.get(idx)
                 if collection_key:
-                    main_collections[category_code] = collection_key
-                    created_main += 1
-                    logger.info(f"✅ 创建主分类: {category_name} (key: {collection_key})")
-                    existing_names[category_name] = collection_key
-                    category_data['collection_key'] = collection_key
-                    category_data['collection_key'] = collection_key
+                    collection_keys[node['id']] = collection_key
+                    node['data']['collection_key'] = collection_key
+                    created += 1
+                    logger.info(f"✅ 创建{level_label}: {node['name']} (key: {collection_key})")
                 else:
-                    logger.error(f"❌ 创建主分类失败: {category_name}")
-        
-        logger.info(f"📊 主分类创建完成:")
-        logger.info(f"   创建成功: {created_main} 个")
-        logger.info(f"   跳过已存在: {len(main_categories) - created_main} 个")
-        
-        # 创建子分类集合
-        logger.info(f"🎯 创建子分类集合:")
-        total_subcategories = 0
-        created_subcategories = 0
-        
-        for category_code, category_data in main_categories.items():
-            subcategories = category_data.get("subcategories", {})
-            total_subcategories += len(subcategories)
-            
-            if not subcategories:
-                continue
-            
-            parent_name = category_data["name"]
-            logger.info(f"📂 为 {parent_name} 创建子分类:")
+                    logger.error(f"❌ 创建{level_label}失败: {node['name']}")
             
-            for sub_cat_code, sub_cat_info in subcategories.items():
-                sub_name = sub_cat_info.get("name", "")
-                
-                
-                
-                if dry_run:
-                    logger.info(f"🔍 [干运行] 将创建子分类: {sub_name} (父分类: {parent_name})")
-                else:
-                    parent_key = main_collections.get(category_code)
-                    if parent_key:
-                        collection_key = self._create_collection(sub_name, parent_key=parent_key)
-                        if collection_key:
-                            all_collection_keys[sub_cat_code] = collection_key
-                            created_subcategories += 1
-                            sub_cat_info['collection_key'] = collection_key
-                            sub_cat_info['collection_key'] = collection_key
-                    else:
-                        logger.error(f"❌ 无法创建子分类 {sub_name} - 父分类 {parent_name} 不存在")
+            total_created += created
+            logger.info(f"📊 {level_label}创建完成:")
+            logger.info(f"   创建成功: {created} 个")
+            logger.info(f"   跳过已存在: {skipped} 个")
         
         logger.info(f"📊 创建完成统计:")
         logger.info(f"   主分类总数: {len(main_categories)}")
-        logger.info(f"   子分类总数: {total_subcategories}")
-        logger.info(f"   实际创建子分类: {created_subcategories}")
+        logger.info(f"   子分类总数: {sum(len(level) for level in levels[1:])}")
+        logger.info(f"   实际创建集合: {total_created}")
         
-        # 保存更新后的schema（包含collection_key）
         if not dry_run:
-            # 创建带collection_key的schema文件
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            updated_schema_file = f"data/schema_with_collection_keys_{timestamp}.json"
-            
-            # 构建完整的schema
-            complete_schema = {
-                "metadata": {
-                    "created_at": datetime.now().isoformat(),
-                    "status": "collections_created",
-                    "total_collections_created": len(main_collections) + created_subcategories
-                },
-                "classification_schema": classification_system,
-                "collection_mapping": main_collections
-            }
-            
-            with open(updated_schema_file, 'w', encoding='utf-8') as f:
-                json.dump(complete_schema, f, ensure_ascii=False, indent=2)
-            
             logger.info(f"✅ 所有集合创建完成！")
-            logger.info(f"📁 更新后的schema已保存到: {updated_schema_file}")
-            return updated_schema_file
+            main_collections = {node['id'][0]: collection_keys[node['id']] for node in levels[0] if node['id'] in collection_keys}
+            return main_collections, total_created
         else:
             logger.info(f"🔍 干运行完成，未实际创建任何集合")
             return None
     
-    def _get_existing_collections(self) -> Dict[str, str]:
-        """获取现有集合"""
+    def _zotero_request(self, method: str, url: str, max_attempts: int = 4, **kwargs) -> "requests.Response":
+        """
+        发送Zotero API请求
+        
+        Session的自动重试不包含POST，这里统一处理429：按Retry-After等待，缺省时使用带随机抖动的指数退避；
+        429表示请求未被处理，重试不会重复写入。遵循Backoff响应头。
+        不调用raise_for_status，HTTP错误状态由调用方检查response.ok处理，只有网络层错误会抛出RequestException
+        """
+        session = self._get_zotero_client()['session']
+        for attempt in range(max_attempts):
+            response = session.request(method, url, timeout=30, **kwargs)
+            if response.status_code != 429 or attempt == max_attempts - 1:
+                break
+            retry_after = response.headers.get('Retry-After', '')
+            wait_seconds = float(retry_after) if retry_after.isdigit() else 2 ** attempt + random.uniform(0, 1)
+            logger.warning(f"⏳ Zotero请求过于频繁，{wait_seconds:.0f} 秒后重试")
+            time.sleep(wait_seconds)
+        _respect_backoff(response)
+        return response
+    
+    def _fetch_collections_page(self, start: int, headers: Dict[str, str] = None) -> "requests.Response":
+        """获取单页集合（Zotero默认只返回25个，需显式分页）"""
+        url = self._get_zotero_client()['collections_url']
+        params = {'start': start, 'limit': 100}
+        
+        # 认证头已设置在Session上，这里只传入额外的条件请求头
+        return self._zotero_request('GET', url, headers=headers, params=params)
+    
+    def _load_collections_disk_cache(self) -> Optional[Tuple[str, Dict[str, str], Dict[str, Optional[str]]]]:
+        """读取磁盘上的集合缓存，返回(库版本号, 集合映射, 父集合映射)"""
+        if not os.path.exists(self._collections_cache_file):
+            return None
         try:
-            # 使用配置系统
-            zotero_config = get_zotero_config()
+            cache = _read_json_file(self._collections_cache_file)
+            if cache.get('user_id') != self._zotero_user_id:
+                logger.info("ℹ️  集合缓存不属于当前Zotero库，忽略")
+                return None
+            if 'version' in cache and isinstance(cache.get('collections'), dict) and isinstance(cache.get('parents'), dict):
+                return str(cache['version']), cache['collections'], cache['parents']
+        except Exception as e:
+            logger.warning(f"⚠️  读取集合缓存失败: {e}")
+        return None
+    
+    def _save_collections_disk_cache(self, version: str, collection_dict: Dict[str, str], parents: Dict[str, Optional[str]]) -> None:
+        """写入磁盘集合缓存"""
+        try:
+            self._ensure_output_dir(self._collections_cache_file)
+            _write_json_file(self._collections_cache_file, {
+                'user_id': self._zotero_user_id, 'version': version, 'collections': collection_dict, 'parents': parents
+            })
+        except Exception as e:
+            logger.warning(f"⚠️  保存集合缓存失败: {e}")
+    
+    def _get_cached_collections_offline(self) -> Dict[str, str]:
+        """不访问网络，返回磁盘缓存中的现有集合（供干运行预览，缓存可能已过期）"""
+        if self._existing_collections_cache is None:
+            self._existing_collections_cache = self._load_collections_disk_cache()
+        cached = self._existing_collections_cache
+        if cached is None:
+            logger.info("ℹ️  干运行未连接Zotero且没有集合缓存，预览将按全部新建显示")
+            return {}
+        logger.info(f"ℹ️  干运行未连接Zotero，使用缓存的 {len(cached[1])} 个现有集合 (库版本 {cached[0]})")
+        self._existing_collection_parents = cached[2]
+        return cached[1]
+    
+    def _get_existing_collections(self) -> Optional[Dict[str, str]]:
+        """
+        获取现有集合（分页获取全部，按库版本号缓存在内存和磁盘）
+        
+        任何一页获取或解析失败都返回None（空字典表示获取成功且库中没有集合）；
+        调用方遇到None必须放弃创建，否则已有集合会被当作不存在而重复创建
+        """
+        import requests
+        
+        try:
+            headers = None
+            if self._existing_collections_cache is None:
+                self._existing_collections_cache = self._load_collections_disk_cache()
+            cached = self._existing_collections_cache
+            if cached is not None:
+                headers = {'If-Modified-Since-Version': str(cached[0])}
             
-            url = f"https://api.zotero.org/users/{zotero_config.user_id}/collections"
-            headers = zotero_config.headers
+            response = self._fetch_collections_page(0, headers)
+            if response.status_code == 304 and cached is not None:
+                logger.info(f"✅ 集合未变化 (库版本 {cached[0]})，使用缓存的 {len(cached[1])} 个现有集合")
+                self._existing_collection_parents = cached[2]
+                return cached[1]
+            if not response.ok:
+                logger.error(f"❌ 获取集合失败: {response.status_code} {response.reason}")
+                return None
             
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
+            collections = _parse_response_json(response)
+            
+            # 根据Total-Results并发获取剩余页面
+            total = int(response.headers.get('Total-Results', len(collections)))
+            offsets = range(100, total, 100) if collections else range(0)
+            if offsets:
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(offsets))) as executor:
+                    for page in executor.map(self._fetch_collections_page, offsets):
+                        # 缺页会导致已有集合被重复创建，任何一页失败都放弃本次结果（返回None，由调用方终止创建）
+                        if not page.ok:
+                            logger.error(f"❌ 获取集合失败: {page.status_code} {page.reason}")
+                            return None
+                        collections.extend(_parse_response_json(page))
             
-            collections = response.json()
             collection_dict = {}
+            parents = {}
             
             for collection in collections:
                 key = collection.get('key')
-                name = collection.get('data', {}).get('name', '')
+                data = collection.get('data', {})
+                name = data.get('name', '')
                 if key and name:
                     collection_dict[key] = name
+                    # 顶层集合的parentCollection为false
+                    parents[key] = data.get('parentCollection') or None
+            
+            self._existing_collection_parents = parents
+            version = response.headers.get('Last-Modified-Version')
+            if version:
+                self._existing_collections_cache = (version, collection_dict, parents)
+                self._save_collections_disk_cache(version, collection_dict, parents)
             
             logger.info(f"✅ 获取到 {len(collection_dict)} 个现有集合")
             return collection_dict
             
-        except Exception as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # ValueError覆盖JSON解析失败与非法的Total-Results
             logger.error(f"❌ 获取集合异常: {e}")
-            return {}
+            return None
     
     def _create_collection(self, name: str, description: str = "", parent_key: str = None) -> str:
-        """创建集合"""
+        """创建单个集合（Zotero集合没有描述字段，description仅保留接口兼容）"""
+        return self._create_collections_batch([(name, parent_key)]).get(0, "")
+    
+    def _post_collections(self, specs: List[Tuple[str, Optional[str]]]) -> Dict[int, str]:
+        """一次POST创建一批集合（不超过50个），返回批内序号到集合key的映射"""
+        import requests
+        
+        zotero_client = self._get_zotero_client()
+        url = zotero_client['collections_url']
+        
+        # 构建集合数据，有父集合时添加到父集合下
+        collection_data = [{"name": name, "parentCollection": parent_key} if parent_key else {"name": name}
+                           for name, parent_key in specs]
+        # Session请求头已带Content-Type: application/json，有orjson时直接发送编码好的字节，跳过requests内部的json.dumps
+        if orjson is not None:
+            body = {'data': orjson.dumps(collection_data)}
+        else:
+            body = {'json': collection_data}
+        
         try:
-            # 使用配置系统
-            zotero_config = get_zotero_config()
-            
-            url = f"https://api.zotero.org/users/{zotero_config.user_id}/collections"
-            headers = zotero_config.headers
-            
-            # 构建集合数据
-            collection_data = [{
-                "name": name
-            }]
-            
-            # 如果有父集合，添加到父集合下
-            if parent_key:
-                collection_data[0]["parentCollection"] = parent_key
-            
-            response = requests.post(url, headers=headers, json=collection_data)
-            response.raise_for_status()
-            
-            result = response.json()
-            if result.get('successful') and '0' in result['successful']:
-                collection_key = result['successful']['0']['key']
-            else:
-                logger.error(f"❌ 创建集合失败: {result}")
-                collection_key = None
-            
-            if collection_key:
-                logger.info(f"✅ 创建集合成功: {name} (key: {collection_key})")
-                return collection_key
-            else:
-                logger.error(f"❌ 创建集合失败: 未获取到key")
-                return ""
-        except Exception as e:
+            response = self._zotero_request('POST', url, **body)
+            if not response.ok:
+                logger.error(f"❌ 创建集合失败: {response.status_code} {response.reason}")
+                return {}
+            result = _parse_response_json(response)
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"❌ 创建集合失败: {e}")
-            return ""
+            return {}
+        
+        for idx, failure in (result.get('failed') or {}).items():
+            logger.error(f"❌ 创建集合失败: {specs[int(idx)][0]} - {failure.get('message', failure)}")
+        
+        created = {}
+        for idx, obj in (result.get('successful') or {}).items():
+            created[int(idx)] = obj['key']
+            logger.debug(f"✅ 创建集合成功: {specs[int(idx)][0]} (key: {obj['key']})")
+        return created
+    
+    def _create_collections_batch(self, specs: List[Tuple[str, Optional[str]]]) -> Dict[int, str]:
+        """
+        批量创建集合，specs为(名称, 父集合key)列表，返回specs序号到集合key的映射（失败的不包含）
+        
+        Zotero单次POST最多接受50个对象，按50个一批切分，多批之间并发提交
+        """
+        batch_size = 50
+        offsets = range(0, len(specs), batch_size)
+        if not offsets:
+            return {}
+        
+        created = {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(offsets))) as executor:
+            batch_results = executor.map(lambda start: self._post_collections(specs[start:start + batch_size]), offsets)
+            for start, batch_created in zip(offsets, batch_results):
+                for idx, key in batch_created.items():
+                    created[start + idx] = key
+        return created
     
     def save_collection_mapping(self, output_file: str = None) -> str:
         """保存集合映射"""
         if output_file is None:
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"data/collection_mapping_{timestamp}.json"
+            output_file = f"data/collection_mapping_{self._run_ts}.json"
         
         try:
-            os.makedirs(os.path.dirname(output_file), exist_ok=True)
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(self.collection_keys, f, ensure_ascii=False, indent=2)
+            self._ensure_output_dir(output_file)
+            _write_json_file(output_file, self.collection_keys)
             
             logger.info(f"✅ 集合映射已保存到: {output_file}")
             return output_file
@@ -763,6 +1452,10 @@ def main():
   # 测试模式
   python 002_generate_schema_and_create_collections.py --test --input data/literature_info.xlsx
 
+  # 非交互环境（cron、CI）：跳过确认，并限制LLM估算成本
+  python 002_generate_schema_and_create_collections.py --generate-schema --input data/literature_info.xlsx --max-cost-usd 1.0
+  python 002_generate_schema_and_create_collections.py --create-collections --schema data/classification_schema_ready.json --yes
+
 注意事项:
   - 需要配置LLM API环境变量
   - 需要配置Zotero API环境变量
@@ -778,12 +1471,15 @@ def main():
     mode_group.add_argument('--create-collections', action='store_true', help='第二步：创建Zotero集合（危险操作）')
     
     # 文件路径参数
-    parser.add_argument('--input', type=str, help='文献数据文件路径（Excel格式）')
+    parser.add_argument('--input', type=str, help='文献数据文件路径（Excel或Parquet格式）')
     parser.add_argument('--schema', type=str, help='分类schema文件路径（JSON格式）')
     
     # 可选参数
     parser.add_argument('--max-items', type=int, help='最大处理文献数量（默认使用所有文献）')
     parser.add_argument('--dry-run', action='store_true', help='干运行模式，只显示计划，不实际创建')
+    parser.add_argument('--map-reduce', action='store_true', help='分片并发生成局部分类体系后再合并（文献量大时自动启用）')
+    parser.add_argument('--yes', '-y', action='store_true', help='跳过交互确认（用于cron、CI等非交互环境）')
+    parser.add_argument('--max-cost-usd', type=float, help='估算LLM成本上限（美元），超出时不调用LLM并以非零状态退出')
     
     args = parser.parse_args()
     
@@ -791,19 +1487,19 @@ def main():
     if args.test or args.generate_schema:
         if not args.input:
             parser.error("--test 和 --generate-schema 模式需要指定 --input 参数")
-        if not os.path.exists(args.input):
+        if not Path(args.input).is_file():
             parser.error(f"输入文件不存在: {args.input}")
     
     if args.create_collections:
         if not args.schema:
             parser.error("--create-collections 模式需要指定 --schema 参数")
-        if not os.path.exists(args.schema):
+        if not Path(args.schema).is_file():
             parser.error(f"Schema文件不存在: {args.schema}")
     
     # 创建管理器（根据模式决定初始化）
     if args.create_collections:
-        # 创建集合模式需要Zotero客户端
-        manager = SchemaBasedCollectionManager(init_llm=False, init_zotero=True)
+        # 创建集合模式需要Zotero客户端；干运行只做预览，不建立连接
+        manager = SchemaBasedCollectionManager(init_llm=False, init_zotero=not args.dry_run)
     else:
         # 其他模式需要LLM客户端
         manager = SchemaBasedCollectionManager(init_llm=True, init_zotero=False)
@@ -816,7 +1512,10 @@ def main():
             literature_file=args.input, 
             max_items=args.max_items or get_default_test_items(), 
             dry_run=False,
-            return_schema_only=True
+            return_schema_only=True,
+            map_reduce=args.map_reduce,
+            assume_yes=args.yes,
+            max_cost_usd=args.max_cost_usd
         )
         
         if classification_system:
@@ -839,7 +1538,10 @@ def main():
             literature_file=args.input, 
             max_items=args.max_items, 
             dry_run=False,
-            return_schema_only=True
+            return_schema_only=True,
+            map_reduce=args.map_reduce,
+            assume_yes=args.yes,
+            max_cost_usd=args.max_cost_usd
         )
         
         if classification_system:
@@ -872,7 +1574,10 @@ def main():
         print(f"  子分类数: {summary['sub_categories']}")
         print(f"  总分类数: {summary['total_categories']}")
         
-        if not args.dry_run:
+        if not args.dry_run and not args.yes:
+            if not sys.stdin.isatty():
+                print("❌ 非交互环境无法确认，请使用 --yes 跳过确认", file=sys.stderr)
+                return 1
             confirm = input(f"\n⚠️  这是一个危险操作，将永久修改您的Zotero库。确认要创建这些集合吗？(y/N): ").strip().lower()
             if confirm != 'y':
                 print("操作已取消")
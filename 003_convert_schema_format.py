@@ -8,6 +8,7 @@ import json
 import argparse
 import os
 from datetime import datetime
+from collections import defaultdict
 from typing import Dict, Any, List
 
 
@@ -103,6 +104,14 @@ def convert_old_to_new_format(old_schema: Dict[str, Any]) -> Dict[str, Any]:
     classification_schema = old_schema.get("classification_schema", {})
     main_categories = classification_schema.get("main_categories", {})
     
+    # 从hierarchy_analysis预先构建 父分类 -> 子分类key列表 的映射（保持原有顺序），
+    # 避免对每个子分类都遍历整个sub_categories_mapping
+    hierarchy_analysis = old_schema.get("metadata", {}).get("hierarchy_analysis", {})
+    sub_categories_mapping = hierarchy_analysis.get("sub_categories_mapping", {})
+    sub_keys_by_parent = defaultdict(list)
+    for key, parent in sub_categories_mapping.items():
+        sub_keys_by_parent[parent].append(key)
+    
     # 转换main_categories
     converted_main_categories = {}
     
@@ -110,20 +119,17 @@ def convert_old_to_new_format(old_schema: Dict[str, Any]) -> Dict[str, Any]:
         # 转换subcategories从数组格式到对象格式
         subcategories = main_category.get("subcategories", [])
         converted_subcategories = {}
+        candidate_keys = sub_keys_by_parent.get(main_key, [])
         
         for sub_category in subcategories:
             # 从hierarchy_analysis中找到对应的sub_key
             sub_key = None
-            hierarchy_analysis = old_schema.get("metadata", {}).get("hierarchy_analysis", {})
-            sub_categories_mapping = hierarchy_analysis.get("sub_categories_mapping", {})
-            
-            for key, parent in sub_categories_mapping.items():
-                if parent == main_key:
-                    # 检查这个子分类是否匹配当前项
-                    # 这里需要根据name或description来匹配
-                    if sub_category.get("name") in key or key in sub_category.get("name", ""):
-                        sub_key = key
-                        break
+            for key in candidate_keys:
+                # 检查这个子分类是否匹配当前项
+                # 这里需要根据name或description来匹配
+                if sub_category.get("name") in key or key in sub_category.get("name", ""):
+                    sub_key = key
+                    break
             
             # 如果没有找到匹配的key，使用name作为key
             if not sub_key:
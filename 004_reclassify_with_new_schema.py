@@ -16,6 +16,7 @@
 import os
 import sys
 import json
+import re
 import pandas as pd
 import time
 import requests
@@ -25,8 +26,10 @@ from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 import logging
 from tqdm import tqdm
-import multiprocessing as mp
-from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 导入配置系统
 from config import (
@@ -40,9 +43,159 @@ from config import (
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _write_json_file(filepath: str, data: Any) -> None:
+    """写出JSON文件，优先使用orjson直接序列化为UTF-8字节（2空格缩进）"""
+    if orjson is not None:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+def _read_json_file(filepath: str) -> Any:
+    """读取JSON文件，优先使用orjson解析"""
+    with open(filepath, 'rb') as f:
+        raw = f.read()
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
+def _excel_cell_value(value: Any) -> Any:
+    """转换为xlsxwriter可直接写出的值：缺失值写空单元格，列表按'; '连接，日期写为文本"""
+    if isinstance(value, (list, tuple)):
+        return '; '.join(str(v) for v in value)
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    if isinstance(value, datetime):
+        return str(value)
+    return value
+
+def _loads_json(text: str) -> Any:
+    """解析LLM返回的JSON文本，优先使用orjson（orjson.JSONDecodeError是json.JSONDecodeError的子类）"""
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+# JSON结构字符：大括号、引号和转义符（提取JSON对象时只需检查这些位置）
+_JSON_STRUCT_CHAR_RE = re.compile(r'[{}"\\]')
+
+def _extract_first_json_object(text: str) -> Optional[str]:
+    """
+    提取文本中第一个完整的JSON对象
+    
+    有```json代码块时从代码块内开始查找；单次扫描并跟踪大括号深度（跳过字符串内的括号和转义），
+    深度回到0即结束，对象之后的说明文字不会被截入；对象未闭合时返回None
+    """
+    fence_idx = text.find('```json')
+    start = text.find('{', fence_idx if fence_idx != -1 else 0)
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = False
+    pos = start
+    while True:
+        match = _JSON_STRUCT_CHAR_RE.search(text, pos)
+        if match is None:
+            return None
+        ch = match.group()
+        pos = match.end()
+        if ch == '\\':
+            # 转义符后的字符（如\"）不参与结构判断
+            pos += 1
+        elif ch == '"':
+            in_string = not in_string
+        elif in_string:
+            continue
+        elif ch == '{':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return text[start:pos]
+
 # 导入自定义模块
 from llm_client import LLMClient
 
+# 输出token预算：每篇文献的分类结果（item_key、最多5个集合代码、一句理由）约100 token
+_OUTPUT_TOKENS_PER_ITEM = 120
+_OUTPUT_TOKENS_OVERHEAD = 200
+_MAX_OUTPUT_TOKENS = 8192
+
+# 单篇分类提示词模板（静态部分只构建一次）
+_SINGLE_CLASSIFICATION_PROMPT_TEMPLATE = """请根据以下文献信息，从给定的集合中选择最合适的分类。
+
+文献信息：
+标题：{title}
+摘要：{abstract}
+
+可用集合：
+{collections_text}
+
+请严格按照以下JSON格式返回分类结果：
+{{
+    "recommended_collections": ["collection_code1", "collection_code2"],
+    "reasoning": "分类理由说明"
+}}
+
+要求：
+1. recommended_collections: 最多推荐5个集合，按优先级排序
+2. 只使用上述集合代码，不要创建新的分类
+3. 确保集合代码完全匹配
+4. reasoning: 简要说明分类理由
+5. 如果文献与任何集合都不匹配，返回空数组
+
+请只返回JSON格式，不要包含其他内容。"""
+
+# 批量分类提示词模板
+_BATCH_CLASSIFICATION_PROMPT_TEMPLATE = """
+# ROLE: You are a professional AI literature classification engine.
+
+# CORE TASK: Your primary task is to accurately assign each document from a given list (`items_text`) to one or more relevant categories from a predefined, flat list of collections (`collections_text`).
+
+---
+
+### Input Data
+
+1.  **Available Collections (`{collections_text}`)**:
+    * **Format**: A flat JSON list of available classification categories. Each category object contains a `collection_key`,`name`,`description`.
+    * **Example**: `- 9KGVHHUD: Foundation Models - Large-scale models pre-trained on vast data, serving as a base for various downstream tasks, such as GPT-3, Llama 3, and ERNIE 4.5.\n- T6PHSH3J: Large Language Models (LLMs) - Models specifically designed for understanding, generating, and processing natural language, including architectures, training methodologies, and few-shot learning capabilities.`
+
+2.  **Items to Classify (`{items_text}`)**:
+    * **Format**: A JSON list of documents, where each document has a unique `literature`, `title` and `abstract`.
+
+---
+
+### Core Requirements
+
+1.  **High-Confidence Principle: DO NOT FORCE CLASSIFICATION.** You must first carefully read and internalize the `description` of each available category. Only recommend a category if the document's core topic **clearly and strongly aligns** with the category's description. Avoid all weak, speculative, or overly broad matches.
+2.  **Semantic Matching**: Perform a precise semantic match between a document's primary research contribution and the category descriptions. Focus on the core problem being solved, not just shared keywords.
+3.  **Ranking and Limits**: If confident matches are found, recommend **1 to 5** of the most relevant categories. The results in the `recommended_collections` array MUST be sorted by relevance, from **highest to lowest**.
+4.  **Code Integrity**: The `recommended_collections` array MUST ONLY contain the `code` values from the provided `collections_text` list. Ensure the codes match exactly.
+5.  **Provide Reasoning**: In the `reasoning` field, provide a brief, one-sentence explanation that justifies the high-confidence match by linking the document's specific contribution to the category's definition.
+6.  **No-Match Handling**: Following the High-Confidence Principle, if a document does not have a strong and clear match with any category, the `recommended_collections` field must be an **empty array `[]`**.
+7.  **Maintain Order**: The order of the documents in your final output must be **exactly the same** as the order in the input `items_text`.
+
+---
+
+### Output Format
+
+You MUST strictly adhere to the following JSON structure. Do not include any text, notes, or explanations outside of this JSON object.
+
+```json
+{{
+    "classifications": [
+        {{
+            "item_key": "item_key_of_document_1",
+            "recommended_collections": ["collection_code1", "collection_code2"],
+            "reasoning": "A brief explanation of why the document was assigned to these collections."
+        }},
+        {{
+            "item_key": "item_key_of_document_2",
+            "recommended_collections": ["collection_code3"],
+            "reasoning": "A brief explanation of why the document was assigned to this collection."
+        }}
+    ]
+}}
+```
+"""
+
 class NewSchemaLiteratureClassifier:
     """基于新schema的文献分类器"""
     
@@ -59,6 +212,13 @@ class NewSchemaLiteratureClassifier:
         self.successful_classifications = 0
         self.failed_classifications = 0
         
+        # 渲染后的集合列表（同一个collection_mapping只构建一次）
+        self._collections_text = ""
+        self._collections_text_source = None
+        
+        # 已加载的文献数据：路径 -> 记录列表
+        self._literature_cache = {}
+        
     def _init_llm_client(self) -> Optional[LLMClient]:
         """初始化LLM客户端"""
         try:
@@ -71,8 +231,7 @@ class NewSchemaLiteratureClassifier:
     def _load_schema(self, schema_file: str) -> Dict[str, Any]:
         """加载schema文件"""
         try:
-            with open(schema_file, 'r', encoding='utf-8') as f:
-                schema = json.load(f)
+            schema = _read_json_file(schema_file)
             logger.info(f"✅ 成功加载schema: {schema_file}")
             return schema
         except Exception as e:
@@ -120,78 +279,104 @@ class NewSchemaLiteratureClassifier:
         return collection_mapping
     
     def _load_literature_data(self, literature_file: str) -> List[Dict[str, Any]]:
-        """加载文献数据"""
+        """
+        加载文献数据
+        
+        分类和生成Excel报告都要读取同一文件，解析结果按路径缓存；
+        Excel文件首次读取后在同目录写入Parquet缓存，源文件未修改时直接读取缓存（需要pyarrow，不可用时每次读取Excel）
+        """
+        if literature_file in self._literature_cache:
+            return self._literature_cache[literature_file]
+        
         try:
-            # 支持Excel和JSON格式
+            # 支持Excel、Parquet和JSON格式
+            # 空单元格统一填充为空字符串：read_excel返回NaN，经Parquet往返后变为None，
+            # 不统一时提示词中会分别出现"nan"和"None"，同一文献的提示词在两次运行间不一致，LLM缓存无法命中
             if literature_file.endswith('.xlsx'):
-                df = pd.read_excel(literature_file)
-                literature_data = df.to_dict('records')
+                df = self._read_excel_with_parquet_cache(literature_file)
+                literature_data = df.fillna('').to_dict('records')
+            elif literature_file.endswith('.parquet'):
+                df = pd.read_parquet(literature_file)
+                literature_data = df.fillna('').to_dict('records')
             elif literature_file.endswith('.json'):
-                with open(literature_file, 'r', encoding='utf-8') as f:
-                    literature_data = json.load(f)
+                literature_data = _read_json_file(literature_file)
             else:
                 logger.error(f"❌ 不支持的文件格式: {literature_file}")
                 return []
             
             logger.info(f"✅ 成功加载文献数据: {len(literature_data)} 篇文献")
+            self._literature_cache[literature_file] = literature_data
             return literature_data
             
         except Exception as e:
             logger.error(f"❌ 加载文献数据失败: {e}")
             return []
     
+    def _read_excel_with_parquet_cache(self, literature_file: str) -> pd.DataFrame:
+        """读取Excel文献文件，优先使用未过期的Parquet缓存"""
+        source = Path(literature_file)
+        cache_file = source.with_name(f"{source.stem}.literature.parquet")
+        if cache_file.exists() and cache_file.stat().st_mtime >= source.stat().st_mtime:
+            try:
+                df = pd.read_parquet(cache_file)
+                logger.info(f"⚡ 使用Parquet缓存: {cache_file}")
+                return df
+            except Exception as e:
+                logger.warning(f"⚠️  读取Parquet缓存失败，重新读取Excel: {e}")
+        
+        df = pd.read_excel(literature_file)
+        try:
+            df.to_parquet(cache_file, index=False, compression='zstd')
+        except Exception as e:
+            logger.debug(f"写入Parquet缓存失败（可能未安装pyarrow）: {e}")
+        return df
+    
+    def _is_already_classified(self, item: Dict[str, Any], collection_mapping: Dict[str, Dict[str, str]]) -> bool:
+        """文献是否已在新分类体系的集合中（collections_keys来自001/006导出，Excel中以'; '连接）"""
+        collection_keys = item.get('collections_keys')
+        if isinstance(collection_keys, str):
+            collection_keys = collection_keys.split('; ')
+        elif not isinstance(collection_keys, list):
+            return False
+        return not collection_mapping.keys().isdisjoint(collection_keys)
+    
+    def _output_token_budget(self, item_count: int) -> int:
+        """按批次文献数估算输出token上限，避免统一使用过大或过小的max_tokens"""
+        return min(_OUTPUT_TOKENS_OVERHEAD + _OUTPUT_TOKENS_PER_ITEM * item_count, _MAX_OUTPUT_TOKENS)
+    
+    def _get_collections_text(self, collection_mapping: Dict[str, Dict[str, str]]) -> str:
+        """获取提示词中的集合列表文本（按collection_mapping对象缓存）"""
+        if self._collections_text_source is not collection_mapping:
+            self._collections_text = "\n".join(
+                f"- {code}: {info.get('name', '')} - {info.get('description', '')}"
+                for code, info in collection_mapping.items()
+            )
+            self._collections_text_source = collection_mapping
+        return self._collections_text
+    
     def _prepare_classification_prompt(self, item: Dict[str, Any], collection_mapping: Dict[str, Dict[str, str]]) -> str:
         """准备分类提示词"""
         title = str(item.get('title', '')).strip()
         abstract = str(item.get('abstract', '')).strip()
         
-        # 构建集合列表
-        collection_list = []
-        for code, info in collection_mapping.items():
-            name = info.get('name', '')
-            description = info.get('description', '')
-            collection_list.append(f"- {code}: {name} - {description}")
+        # 集合列表对所有文献相同，只渲染一次
+        collections_text = self._get_collections_text(collection_mapping)
         
-        collections_text = "\n".join(collection_list)
-        
-        prompt = f"""请根据以下文献信息，从给定的集合中选择最合适的分类。
-
-文献信息：
-标题：{title}
-摘要：{abstract}
-
-可用集合：
-{collections_text}
-
-请严格按照以下JSON格式返回分类结果：
-{{
-    "recommended_collections": ["collection_code1", "collection_code2"],
-    "reasoning": "分类理由说明"
-}}
-
-要求：
-1. recommended_collections: 最多推荐5个集合，按优先级排序
-2. 只使用上述集合代码，不要创建新的分类
-3. 确保集合代码完全匹配
-4. reasoning: 简要说明分类理由
-5. 如果文献与任何集合都不匹配，返回空数组
-
-请只返回JSON格式，不要包含其他内容。"""
+        prompt = _SINGLE_CLASSIFICATION_PROMPT_TEMPLATE.format(
+            title=title, abstract=abstract, collections_text=collections_text
+        )
         
         return prompt
     
     def _parse_classification_response(self, response: str) -> Dict[str, Any]:
         """解析分类响应"""
         try:
-            # 尝试提取JSON部分
-            start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
+            # 提取第一个完整的JSON对象（忽略代码块标记和前后的说明文字）
+            json_str = _extract_first_json_object(response)
+            if json_str is None:
                 return {"recommended_collections": [], "reasoning": "无法解析响应"}
             
-            json_str = response[start_idx:end_idx]
-            result = json.loads(json_str)
+            result = _loads_json(json_str)
             
             # 验证响应格式
             if 'recommended_collections' not in result:
@@ -210,90 +395,30 @@ class NewSchemaLiteratureClassifier:
     
     def _prepare_batch_classification_prompt(self, items: List[Dict[str, Any]], collection_mapping: Dict[str, Dict[str, str]]) -> str:
         """准备批量分类提示词"""
-        # 构建集合列表
-        collection_list = []
-        for code, info in collection_mapping.items():
-            name = info.get('name', '')
-            description = info.get('description', '')
-            collection_list.append(f"- {code}: {name} - {description}")
-        
-        collections_text = "\n".join(collection_list)
-        
-        # 构建文献列表
-        items_text = ""
-        for i, item in enumerate(items, 1):
-            title = str(item.get('title', '')).strip()
-            abstract = str(item.get('abstract', '')).strip()
-            item_key = item.get('item_key', '')
-            
-            items_text += f"""
-文献 {i} (ID: {item_key}):
-标题：{title}
-摘要：{abstract}
-"""
+        # 集合列表对所有文献相同，只渲染一次
+        collections_text = self._get_collections_text(collection_mapping)
         
-        prompt = f"""
-# ROLE: You are a professional AI literature classification engine.
-
-# CORE TASK: Your primary task is to accurately assign each document from a given list (`items_text`) to one or more relevant categories from a predefined, flat list of collections (`collections_text`).
-
----
-
-### Input Data
-
-1.  **Available Collections (`{collections_text}`)**:
-    * **Format**: A flat JSON list of available classification categories. Each category object contains a `collection_key`,`name`,`description`.
-    * **Example**: `- 9KGVHHUD: Foundation Models - Large-scale models pre-trained on vast data, serving as a base for various downstream tasks, such as GPT-3, Llama 3, and ERNIE 4.5.\n- T6PHSH3J: Large Language Models (LLMs) - Models specifically designed for understanding, generating, and processing natural language, including architectures, training methodologies, and few-shot learning capabilities.`
-
-2.  **Items to Classify (`{items_text}`)**:
-    * **Format**: A JSON list of documents, where each document has a unique `literature`, `title` and `abstract`.
-
----
-
-### Core Requirements
-
-1.  **High-Confidence Principle: DO NOT FORCE CLASSIFICATION.** You must first carefully read and internalize the `description` of each available category. Only recommend a category if the document's core topic **clearly and strongly aligns** with the category's description. Avoid all weak, speculative, or overly broad matches.
-2.  **Semantic Matching**: Perform a precise semantic match between a document's primary research contribution and the category descriptions. Focus on the core problem being solved, not just shared keywords.
-3.  **Ranking and Limits**: If confident matches are found, recommend **1 to 5** of the most relevant categories. The results in the `recommended_collections` array MUST be sorted by relevance, from **highest to lowest**.
-4.  **Code Integrity**: The `recommended_collections` array MUST ONLY contain the `code` values from the provided `collections_text` list. Ensure the codes match exactly.
-5.  **Provide Reasoning**: In the `reasoning` field, provide a brief, one-sentence explanation that justifies the high-confidence match by linking the document's specific contribution to the category's definition.
-6.  **No-Match Handling**: Following the High-Confidence Principle, if a document does not have a strong and clear match with any category, the `recommended_collections` field must be an **empty array `[]`**.
-7.  **Maintain Order**: The order of the documents in your final output must be **exactly the same** as the order in the input `items_text`.
-
----
-
-### Output Format
-
-You MUST strictly adhere to the following JSON structure. Do not include any text, notes, or explanations outside of this JSON object.
-
-```json
-{{
-    "classifications": [
-        {{
-            "item_key": "item_key_of_document_1",
-            "recommended_collections": ["collection_code1", "collection_code2"],
-            "reasoning": "A brief explanation of why the document was assigned to these collections."
-        }},
-        {{
-            "item_key": "item_key_of_document_2",
-            "recommended_collections": ["collection_code3"],
-            "reasoning": "A brief explanation of why the document was assigned to this collection."
-        }}
-    ]
-}}
-```
-"""
+        # 构建文献列表（一次join，避免逐条拼接字符串）
+        items_text = "".join(
+            f"\n文献 {i} (ID: {item.get('item_key', '')}):\n"
+            f"标题：{str(item.get('title', '')).strip()}\n"
+            f"摘要：{str(item.get('abstract', '')).strip()}\n"
+            for i, item in enumerate(items, 1)
+        )
+        
+        prompt = _BATCH_CLASSIFICATION_PROMPT_TEMPLATE.format(
+            collections_text=collections_text, items_text=items_text
+        )
 
         return prompt
     
-    def _parse_batch_classification_response(self, response: str, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """解析批量分类响应"""
+    def _parse_batch_classification_response(self, response: str, items: List[Dict[str, Any]],
+                                             collection_mapping: Dict[str, Dict[str, str]]) -> List[Dict[str, Any]]:
+        """解析批量分类响应（只保留collection_mapping中存在的集合代码）"""
         try:
-            # 尝试提取JSON部分
-            start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            
-            if start_idx == -1 or end_idx == 0:
+            # 提取第一个完整的JSON对象（忽略代码块标记和前后的说明文字）
+            json_str = _extract_first_json_object(response)
+            if json_str is None:
                 # 如果无法解析，为所有文献返回失败结果
                 return [{
                     'item_key': item.get('item_key', ''),
@@ -304,8 +429,7 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
                     'error_message': '响应格式错误'
                 } for item in items]
             
-            json_str = response[start_idx:end_idx]
-            result = json.loads(json_str)
+            result = _loads_json(json_str)
             
             # 验证响应格式
             if 'classifications' not in result:
@@ -319,28 +443,33 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
                     'error_message': '缺少classifications字段'
                 } for item in items]
             
-            classifications = result['classifications']
+            # 一次遍历按item_key建立索引（同一key保留第一条，与逐条查找的结果一致）
+            classification_by_key = {}
+            for cls in result['classifications']:
+                classification_by_key.setdefault(cls.get('item_key'), cls)
             results = []
             
             # 为每个文献创建结果
-            for i, item in enumerate(items):
+            for item in items:
                 item_key = item.get('item_key', '')
                 
                 # 查找对应的分类结果
-                classification = None
-                for cls in classifications:
-                    if cls.get('item_key') == item_key:
-                        classification = cls
-                        break
+                classification = classification_by_key.get(item_key)
                 
                 if classification and 'recommended_collections' in classification:
+                    # 按首次出现顺序去重，并丢弃LLM编造的集合代码（字典查找），避免005逐个请求Zotero校验无效集合
+                    codes = list(dict.fromkeys(classification['recommended_collections']))
+                    recommended = [code for code in codes if code in collection_mapping]
+                    dropped = len(codes) - len(recommended)
+                    if dropped:
+                        logger.warning(f"⚠️ 文献 {item_key} 的推荐中有 {dropped} 个集合代码不在分类体系中，已忽略")
                     results.append({
                         'item_key': item_key,
                         'title': item.get('title', ''),
-                        'classification_success': len(classification['recommended_collections']) > 0,
-                        'recommended_collections': classification.get('recommended_collections', []),
+                        'classification_success': len(recommended) > 0,
+                        'recommended_collections': recommended,
                         'reasoning': classification.get('reasoning', ''),
-                        'error_message': '' if len(classification['recommended_collections']) > 0 else '未找到合适的分类'
+                        'error_message': '' if recommended else '未找到合适的分类'
                     })
                 else:
                     results.append({
@@ -384,8 +513,25 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
             prompt = self._prepare_batch_classification_prompt(items, collection_mapping)
             
             # 调用LLM API
-            response = self.llm_client.generate_text(prompt)
+            response = self.llm_client.generate_text(prompt, max_tokens=self._output_token_budget(len(items)))
             
+            return self._handle_batch_response(response, items, collection_mapping)
+    
+        except Exception as e:
+            logger.error(f"批量分类失败: {e}")
+            return [{
+                'item_key': item.get('item_key', ''),
+                'title': item.get('title', ''),
+                'classification_success': False,
+                'recommended_collections': [],
+                'reasoning': '',
+                'error_message': str(e)
+            } for item in items]
+    
+    def _handle_batch_response(self, response: str, items: List[Dict[str, Any]],
+                               collection_mapping: Dict[str, Dict[str, str]]) -> List[Dict[str, Any]]:
+        """处理单个批次的LLM响应"""
+        try:
             if not response:
                 logger.error("❌ LLM API返回空响应")
                 return [{
@@ -398,7 +544,7 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
                 } for item in items]
             
             # 解析响应
-            results = self._parse_batch_classification_response(response, items)
+            results = self._parse_batch_classification_response(response, items, collection_mapping)
             
             # 统计成功数量
             successful = sum(1 for r in results if r['classification_success'])
@@ -417,8 +563,46 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
                 'error_message': str(e)
             } for item in items]
     
-    def classify_literature(self, schema_file: str, literature_file: str, max_items: int = None, batch_size: int = None) -> str:
-        """对文献进行分类"""
+    def _classify_batches(self, batches: List[List[Dict[str, Any]]], collection_mapping: Dict[str, Dict[str, str]],
+                          use_batch_api: bool = False) -> List[List[Dict[str, Any]]]:
+        """并发分类多个批次（或通过Batch API离线处理），返回结果顺序与batches一致"""
+        if not self.llm_client:
+            return [self._classify_batch(batch, collection_mapping) for batch in batches]
+        
+        prompts = [self._prepare_batch_classification_prompt(batch, collection_mapping) for batch in batches]
+        # 同一次调用共用一个上限，按最大的批次计算
+        max_tokens = self._output_token_budget(max(len(batch) for batch in batches))
+        if use_batch_api:
+            logger.info(f"📦 通过Batch API提交 {len(prompts)} 个批次，等待任务完成...")
+            try:
+                responses = self.llm_client.generate_texts_batch_api(prompts, max_tokens=max_tokens)
+            except Exception as e:
+                logger.error(f"❌ Batch API调用失败: {e}")
+                responses = [e] * len(prompts)
+        else:
+            logger.info(f"🚀 并发提交 {len(prompts)} 个批次 (最大并发: {self.llm_client.max_concurrency})")
+            responses = self.llm_client.generate_texts(prompts, max_tokens=max_tokens)
+        
+        all_results = []
+        for batch, response in zip(batches, responses):
+            if isinstance(response, Exception):
+                logger.error(f"批量分类失败: {response}")
+                all_results.append([{
+                    'item_key': item.get('item_key', ''),
+                    'title': item.get('title', ''),
+                    'classification_success': False,
+                    'recommended_collections': [],
+                    'reasoning': '',
+                    'error_message': str(response)
+                } for item in batch])
+            else:
+                all_results.append(self._handle_batch_response(response, batch, collection_mapping))
+        
+        return all_results
+    
+    def classify_literature(self, schema_file: str, literature_file: str, max_items: int = None, batch_size: int = None,
+                            use_batch_api: bool = False, reclassify_all: bool = False) -> Optional[str]:
+        """对文献进行分类，返回分类计划文件路径；所有文献都已分类、无需处理时返回None，失败时返回空字符串"""
         # 加载schema和集合映射
         schema = self._load_schema(schema_file)
         collection_mapping = self._build_collection_mapping(schema)
@@ -429,6 +613,24 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
             logger.error("❌ 没有可分类的文献数据")
             return ""
         
+        # 已在新分类体系集合中的文献无需再调用LLM（只要已在其中任一集合即跳过，不会再补充其他集合）
+        skipped_keys = set()
+        if not reclassify_all:
+            pending = []
+            for item in literature_data:
+                if self._is_already_classified(item, collection_mapping):
+                    skipped_keys.add(item.get('item_key', ''))
+                else:
+                    pending.append(item)
+            skipped = len(literature_data) - len(pending)
+            if skipped:
+                logger.info(f"⏭️  跳过 {skipped} 篇已在新分类体系中的文献，只在部分新集合中的文献也不会补充推荐"
+                            f"（使用 --reclassify-all 重新分类）")
+                literature_data = pending
+            if not literature_data:
+                logger.info("✅ 所有文献都已在新分类体系中，无需分类")
+                return None
+        
         # 限制处理数量
         if max_items:
             literature_data = literature_data[:max_items]
@@ -440,11 +642,11 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
         batch_size = batch_size or get_default_batch_size()
         results = []
         
-        for i in range(0, len(literature_data), batch_size):
-            batch = literature_data[i:i + batch_size]
-            logger.info(f"📦 处理批次 {i//batch_size + 1}/{(len(literature_data) + batch_size - 1)//batch_size}")
-            
-            batch_results = self._classify_batch(batch, collection_mapping)
+        # 各批次相互独立，一次性构建后并发请求LLM
+        batches = [literature_data[i:i + batch_size] for i in range(0, len(literature_data), batch_size)]
+        
+        for batch_idx, batch_results in enumerate(self._classify_batches(batches, collection_mapping, use_batch_api), 1):
+            logger.info(f"📦 批次 {batch_idx}/{len(batches)}")
             results.extend(batch_results)
             
             # 统计进度
@@ -452,8 +654,8 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
             logger.info(f"✅ 批次完成: {len(batch_results)} 篇, 成功: {successful} 篇")
         
         # 保存结果
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            output_file = f"data/classification_plan_{timestamp}.json"
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = f"data/classification_plan_{timestamp}.json"
         excel_file = f"data/classification_plan_{timestamp}.xlsx"
         
         output_data = {
@@ -463,7 +665,8 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
                 'literature_file': literature_file,
                 'total_items': len(results),
                 'successful_classifications': sum(1 for r in results if r['classification_success']),
-                'failed_classifications': sum(1 for r in results if not r['classification_success'])
+                'failed_classifications': sum(1 for r in results if not r['classification_success']),
+                'skipped_already_classified': len(skipped_keys)
             },
             'classifications': results
         }
@@ -472,13 +675,12 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
             os.makedirs(os.path.dirname(output_file), exist_ok=True)
             
             # 保存JSON文件
-            with open(output_file, 'w', encoding='utf-8') as f:
-                json.dump(output_data, f, ensure_ascii=False, indent=2)
+            _write_json_file(output_file, output_data)
         
             logger.info(f"✅ 分类计划已保存到: {output_file}")
             
             # 生成Excel文件
-            self._save_excel_report(results, excel_file, collection_mapping, literature_file)
+            self._save_excel_report(results, excel_file, collection_mapping, literature_file, skipped_keys)
             logger.info(f"✅ Excel报告已保存到: {excel_file}")
             
             return output_file
@@ -487,14 +689,15 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
             logger.error(f"❌ 保存分类计划失败: {e}")
             return ""
         
-    def _save_excel_report(self, results: List[Dict[str, Any]], excel_file: str, collection_mapping: Dict[str, Dict[str, str]], literature_file: str) -> None:
-        """保存Excel格式的分类报告"""
+    def _save_excel_report(self, results: List[Dict[str, Any]], excel_file: str, collection_mapping: Dict[str, Dict[str, str]], literature_file: str,
+                           skipped_keys: Optional[set] = None) -> None:
+        """
+        保存Excel格式的分类报告（优先使用xlsxwriter逐行写出，未安装时使用pandas+openpyxl）
+        
+        已在新分类体系中而跳过的文献（skipped_keys）不写入分类结果表，只在统计信息表中计数
+        """
+        skipped_keys = skipped_keys or set()
         try:
-            import pandas as pd
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-            from openpyxl.utils.dataframe import dataframe_to_rows
-            
             # 读取原始文献数据
             original_data = self._load_literature_data(literature_file)
             
@@ -505,6 +708,8 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
             excel_data = []
             for item in original_data:
                 item_key = item.get('item_key', '')
+                if item_key in skipped_keys:
+                    continue
                 result = results_dict.get(item_key, {})
                 
                 # 将推荐集合列表转换为可读的文本
@@ -570,164 +775,229 @@ You MUST strictly adhere to the following JSON structure. Do not include any tex
                 }
                 excel_data.append(row_data)
         
-            # 创建DataFrame
-            df = pd.DataFrame(excel_data)
+            successful_count = sum(1 for r in results if r['classification_success'])
+            stats_data = {
+                '统计项目': [
+                    '总文献数',
+                    '分类成功数',
+                    '分类失败数',
+                    '成功率',
+                    '跳过（已在新分类体系中）',
+                    '生成时间'
+                ],
+                '数值': [
+                    len(results),
+                    successful_count,
+                    len(results) - successful_count,
+                    f"{successful_count / len(results) * 100:.1f}%" if results else "0%",
+                    len(skipped_keys),
+                    datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                ]
+            }
+            
+            mapping_data = []
+            for code, info in collection_mapping.items():
+                name = info.get('name', '') if isinstance(info, dict) else str(info)
+                description = info.get('description', '') if isinstance(info, dict) else ''
+                mapping_data.append({
+                    '集合代码': code,
+                    '集合名称': name,
+                    '集合描述': description
+                })
+            
+            # 设置列宽
+            column_widths = {
+                'A': 15,  # item_key
+                'B': 50,  # title
+                'C': 15,  # item_type
+                'D': 30,  # authors
+                'E': 40,  # publication_title
+                'F': 30,  # conference_name
+                'G': 15,  # date
+                'H': 25,  # doi
+                'I': 60,  # abstract
+                'J': 30,  # tags
+                'K': 40,  # url
+                'L': 10,  # language
+                'M': 10,  # pages
+                'N': 10,  # volume
+                'O': 10,  # issue
+                'P': 25,  # publisher
+                'Q': 20,  # place
+                'R': 15,  # edition
+                'S': 20,  # series
+                'T': 20,  # isbn
+                'U': 15,  # issn
+                'V': 20,  # call_number
+                'W': 15,  # access_date
+                'X': 20,  # rights
+                'Y': 30,  # extra
+                'Z': 40,  # collections
+                'AA': 40, # collections_keys
+                'AB': 15, # collections_count
+                'AC': 40, # notes
+                'AD': 40, # attachments
+                'AE': 15, # attachments_count
+                'AF': 40, # related_items
+                'AG': 15, # related_items_count
+                'AH': 20, # created_date
+                'AI': 20, # modified_date
+                'AJ': 20, # last_modified_by
+                'AK': 10, # version
+                'AL': 20, # new_classification_success
+                'AM': 40, # new_recommended_collection_keys
+                'AN': 60, # new_recommended_collections
+                'AO': 15, # new_recommended_count
+                'AP': 60, # new_analysis
+                'AQ': 30, # new_error_message
+                'AR': 25, # new_worker_id
+                'AS': 40, # new_response
+                'AT': 20  # new_classification_timestamp
+            }
+            
+            try:
+                import xlsxwriter
+            except ImportError:
+                xlsxwriter = None
+            
+            if xlsxwriter is not None:
+                self._write_excel_report_xlsxwriter(excel_file, excel_data, list(column_widths.values()), stats_data, mapping_data)
+            else:
+                self._write_excel_report_openpyxl(excel_file, excel_data, column_widths, stats_data, mapping_data)
         
-            # 创建Excel文件
-            with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
-                # 写入主数据表
-                df.to_excel(writer, sheet_name='分类结果', index=False)
-                
-                # 获取工作表对象
-                worksheet = writer.sheets['分类结果']
-                
-                # 设置列宽
-                column_widths = {
-                    'A': 15,  # item_key
-                    'B': 50,  # title
-                    'C': 15,  # item_type
-                    'D': 30,  # authors
-                    'E': 40,  # publication_title
-                    'F': 30,  # conference_name
-                    'G': 15,  # date
-                    'H': 25,  # doi
-                    'I': 60,  # abstract
-                    'J': 30,  # tags
-                    'K': 40,  # url
-                    'L': 10,  # language
-                    'M': 10,  # pages
-                    'N': 10,  # volume
-                    'O': 10,  # issue
-                    'P': 25,  # publisher
-                    'Q': 20,  # place
-                    'R': 15,  # edition
-                    'S': 20,  # series
-                    'T': 20,  # isbn
-                    'U': 15,  # issn
-                    'V': 20,  # call_number
-                    'W': 15,  # access_date
-                    'X': 20,  # rights
-                    'Y': 30,  # extra
-                    'Z': 40,  # collections
-                    'AA': 40, # collections_keys
-                    'AB': 15, # collections_count
-                    'AC': 40, # notes
-                    'AD': 40, # attachments
-                    'AE': 15, # attachments_count
-                    'AF': 40, # related_items
-                    'AG': 15, # related_items_count
-                    'AH': 20, # created_date
-                    'AI': 20, # modified_date
-                    'AJ': 20, # last_modified_by
-                    'AK': 10, # version
-                    'AL': 20, # new_classification_success
-                    'AM': 40, # new_recommended_collection_keys
-                    'AN': 60, # new_recommended_collections
-                    'AO': 15, # new_recommended_count
-                    'AP': 60, # new_analysis
-                    'AQ': 30, # new_error_message
-                    'AR': 25, # new_worker_id
-                    'AS': 40, # new_response
-                    'AT': 20  # new_classification_timestamp
-                }
-                
-                for col, width in column_widths.items():
-                    worksheet.column_dimensions[col].width = width
-                
-                # 设置标题行样式
-                header_font = Font(bold=True, color="FFFFFF")
-                header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-                header_alignment = Alignment(horizontal="center", vertical="center")
-                
-                for cell in worksheet[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
-                
-                # 设置数据行样式
-                success_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")  # 浅绿色
-                failure_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")  # 浅红色
-                
-                for row_idx, row in enumerate(worksheet.iter_rows(min_row=2), start=2):
-                    # 根据分类成功状态设置背景色（只对新分类列设置背景色）
-                    success_cell = row[37]  # new_classification_success列 (AL列，索引37)
-                    if success_cell.value == True:
-                        # 只对新分类相关的列设置绿色背景
-                        for i in range(37, 46):  # AL到AT列
-                            if i < len(row):
-                                row[i].fill = success_fill
-                    else:
-                        # 只对新分类相关的列设置红色背景
-                        for i in range(37, 46):  # AL到AT列
-                            if i < len(row):
-                                row[i].fill = failure_fill
-                    
-                    # 设置文本换行
-                    for cell in row:
-                        cell.alignment = Alignment(wrap_text=True, vertical="top")
-        
-                # 创建统计信息表
-                stats_data = {
-                    '统计项目': [
-                        '总文献数',
-                        '分类成功数',
-                        '分类失败数',
-                        '成功率',
-                        '生成时间'
-                    ],
-                    '数值': [
-                        len(results),
-                        sum(1 for r in results if r['classification_success']),
-                        sum(1 for r in results if not r['classification_success']),
-                        f"{sum(1 for r in results if r['classification_success']) / len(results) * 100:.1f}%" if results else "0%",
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                    ]
-                }
-                
-                stats_df = pd.DataFrame(stats_data)
-                stats_df.to_excel(writer, sheet_name='统计信息', index=False)
-                
-                # 设置统计表样式
-                stats_worksheet = writer.sheets['统计信息']
-                stats_worksheet.column_dimensions['A'].width = 15
-                stats_worksheet.column_dimensions['B'].width = 20
-                
-                for cell in stats_worksheet[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
-                
-                # 创建集合映射表
-                mapping_data = []
-                for code, info in collection_mapping.items():
-                    name = info.get('name', '') if isinstance(info, dict) else str(info)
-                    description = info.get('description', '') if isinstance(info, dict) else ''
-                    mapping_data.append({
-                        '集合代码': code,
-                        '集合名称': name,
-                        '集合描述': description
-                    })
-                
-                mapping_df = pd.DataFrame(mapping_data)
-                mapping_df.to_excel(writer, sheet_name='集合映射', index=False)
-                
-                # 设置映射表样式
-                mapping_worksheet = writer.sheets['集合映射']
-                mapping_worksheet.column_dimensions['A'].width = 20
-                mapping_worksheet.column_dimensions['B'].width = 40
-                mapping_worksheet.column_dimensions['C'].width = 60
-                
-                for cell in mapping_worksheet[1]:
-                    cell.font = header_font
-                    cell.fill = header_fill
-                    cell.alignment = header_alignment
-                
         except ImportError as e:
             logger.warning(f"⚠️ 无法生成Excel文件，缺少依赖: {e}")
-            logger.info("请安装: pip install pandas openpyxl")
+            logger.info("请安装: pip install xlsxwriter（或 pandas openpyxl）")
         except Exception as e:
             logger.error(f"❌ 生成Excel文件失败: {e}")
+    
+    def _write_excel_report_xlsxwriter(self, excel_file: str, excel_data: List[Dict[str, Any]], column_widths: List[int],
+                                       stats_data: Dict[str, List[Any]], mapping_data: List[Dict[str, str]]) -> None:
+        """constant_memory模式逐行写出报告，格式对象由xlsxwriter统一管理，无需逐个单元格设置样式"""
+        import xlsxwriter
+        
+        workbook = xlsxwriter.Workbook(excel_file, {'constant_memory': True})
+        try:
+            header_format = workbook.add_format({
+                'bold': True, 'font_color': 'white', 'bg_color': '#366092',
+                'align': 'center', 'valign': 'vcenter'
+            })
+            wrap_format = workbook.add_format({'text_wrap': True, 'valign': 'top'})
+            # 新分类相关的列按成功状态设置浅绿色/浅红色背景
+            success_format = workbook.add_format({'text_wrap': True, 'valign': 'top', 'bg_color': '#C6EFCE'})
+            failure_format = workbook.add_format({'text_wrap': True, 'valign': 'top', 'bg_color': '#FFC7CE'})
+            
+            worksheet = workbook.add_worksheet('分类结果')
+            for col_idx, width in enumerate(column_widths):
+                worksheet.set_column(col_idx, col_idx, width)
+            if excel_data:
+                columns = list(excel_data[0])
+                status_col = columns.index('new_classification_success')
+                worksheet.write_row(0, 0, columns, header_format)
+                for row_idx, row_data in enumerate(excel_data, start=1):
+                    values = [_excel_cell_value(value) for value in row_data.values()]
+                    status_format = success_format if row_data['new_classification_success'] == True else failure_format
+                    worksheet.write_row(row_idx, 0, values[:status_col], wrap_format)
+                    worksheet.write_row(row_idx, status_col, values[status_col:], status_format)
+            
+            stats_worksheet = workbook.add_worksheet('统计信息')
+            stats_worksheet.set_column(0, 0, 15)
+            stats_worksheet.set_column(1, 1, 20)
+            stats_worksheet.write_row(0, 0, list(stats_data), header_format)
+            for row_idx, row in enumerate(zip(*stats_data.values()), start=1):
+                stats_worksheet.write_row(row_idx, 0, row)
+            
+            mapping_worksheet = workbook.add_worksheet('集合映射')
+            mapping_worksheet.set_column(0, 0, 20)
+            mapping_worksheet.set_column(1, 1, 40)
+            mapping_worksheet.set_column(2, 2, 60)
+            mapping_worksheet.write_row(0, 0, ['集合代码', '集合名称', '集合描述'], header_format)
+            for row_idx, row in enumerate(mapping_data, start=1):
+                mapping_worksheet.write_row(row_idx, 0, list(row.values()))
+        finally:
+            workbook.close()
+    
+    def _write_excel_report_openpyxl(self, excel_file: str, excel_data: List[Dict[str, Any]], column_widths: Dict[str, int],
+                                     stats_data: Dict[str, List[Any]], mapping_data: List[Dict[str, str]]) -> None:
+        """通过pandas+openpyxl写出报告（未安装xlsxwriter时使用）"""
+        import pandas as pd
+        from openpyxl.styles import Font, PatternFill, Alignment
         
+        # 创建DataFrame
+        df = pd.DataFrame(excel_data)
+        
+        # 创建Excel文件
+        with pd.ExcelWriter(excel_file, engine='openpyxl') as writer:
+            # 写入主数据表
+            df.to_excel(writer, sheet_name='分类结果', index=False)
+            
+            # 获取工作表对象
+            worksheet = writer.sheets['分类结果']
+            
+            for col, width in column_widths.items():
+                worksheet.column_dimensions[col].width = width
+            
+            # 设置标题行样式
+            header_font = Font(bold=True, color="FFFFFF")
+            header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+            header_alignment = Alignment(horizontal="center", vertical="center")
+            
+            for cell in worksheet[1]:
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_alignment
+            
+            # 设置数据行样式
+            success_fill = PatternFill(start_color="C6EFCE", end_color="C6EFCE", fill_type="solid")  # 浅绿色
+            failure_fill = PatternFill(start_color="FFC7CE", end_color="FFC7CE", fill_type="solid")  # 浅红色
+            
+            for row_idx, row in enumerate(worksheet.iter_rows(min_row=2), start=2):
+                # 根据分类成功状态设置背景色（只对新分类列设置背景色）
+                success_cell = row[37]  # new_classification_success列 (AL列，索引37)
+                if success_cell.value == True:
+                    # 只对新分类相关的列设置绿色背景
+                    for i in range(37, 46):  # AL到AT列
+                        if i < len(row):
+                            row[i].fill = success_fill
+                else:
+                    # 只对新分类相关的列设置红色背景
+                    for i in range(37, 46):  # AL到AT列
+                        if i < len(row):
+                            row[i].fill = failure_fill
+                
+                # 设置文本换行
+                for cell in row:
+                    cell.alignment = Alignment(wrap_text=True, vertical="top")
+            
+            # 创建统计信息表
+            stats_df = pd.DataFrame(stats_data)
+            stats_df.to_excel(writer, sheet_name='统计信息', index=False)
+            
+            # 设置统计表样式
+            stats_worksheet = writer.sheets['统计信息']
+            stats_worksheet.column_dimensions['A'].width = 15
+            stats_worksheet.column_dimensions['B'].width = 20
+            
+            for cell in stats_worksheet[1]:
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_alignment
+            
+            # 创建集合映射表
+            mapping_df = pd.DataFrame(mapping_data)
+            mapping_df.to_excel(writer, sheet_name='集合映射', index=False)
+            
+            # 设置映射表样式
+            mapping_worksheet = writer.sheets['集合映射']
+            mapping_worksheet.column_dimensions['A'].width = 20
+            mapping_worksheet.column_dimensions['B'].width = 40
+            mapping_worksheet.column_dimensions['C'].width = 60
+            
+            for cell in mapping_worksheet[1]:
+                cell.font = header_font
+                cell.fill = header_fill
+                cell.alignment = header_alignment
+
 
 def main():
     """主函数"""
@@ -744,11 +1014,15 @@ def main():
   
   # 指定批量大小
   python 006_reclassify_with_new_schema.py --plan --schema data/schema_with_collection_keys.json --input data/literature_info.xlsx --batch-size 25
+  
+  # 使用OpenAI Batch API（费用减半，适合大量文献的离线分类）
+  python 006_reclassify_with_new_schema.py --plan --schema data/schema_with_collection_keys.json --input data/literature_info.xlsx --batch-api
 
 注意事项:
   - 需要配置LLM API环境变量
   - 建议先使用--test模式测试
   - 分类结果需要手动应用到Zotero
+  - 默认跳过已在新分类体系任一集合中的文献（不写入报告），只在部分新集合中的文献不会补充推荐，需要时使用--reclassify-all
         """
     )
     
@@ -759,11 +1033,13 @@ def main():
     
     # 文件路径参数（强制要求）
     parser.add_argument('--schema', type=str, required=True, help='分类schema文件路径（JSON格式）')
-    parser.add_argument('--input', type=str, required=True, help='文献数据文件路径（Excel或JSON格式）')
+    parser.add_argument('--input', type=str, required=True, help='文献数据文件路径（Excel、Parquet或JSON格式）')
     
     # 可选参数
     parser.add_argument('--max-items', type=int, help='最大处理文献数量')
     parser.add_argument('--batch-size', type=int, help='批量处理大小')
+    parser.add_argument('--batch-api', action='store_true', help='使用OpenAI Batch API离线分类（费用减半，最长24小时完成；中断后用相同参数重新运行会继续等待已提交的任务）')
+    parser.add_argument('--reclassify-all', action='store_true', help='重新分类已在新分类体系集合中的文献（默认跳过：只要已在任一新集合中就不再调用LLM，也不会补充其他集合）')
     
     args = parser.parse_args()
     
@@ -789,9 +1065,14 @@ def main():
         schema_file=args.schema,
         literature_file=args.input,
         max_items=max_items,
-        batch_size=args.batch_size
+        batch_size=args.batch_size,
+        use_batch_api=args.batch_api,
+        reclassify_all=args.reclassify_all
     )
-            
+    
+    if result_file is None:
+        print("\n✅ 所有文献都已在新分类体系中，无需分类（使用 --reclassify-all 重新分类）")
+        return 0
     if result_file:
         # 生成对应的Excel文件名
         excel_file = result_file.replace('.json', '.xlsx')
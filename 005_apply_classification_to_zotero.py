@@ -19,11 +19,17 @@ import json
 import argparse
 import time
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any
 import logging
 from tqdm import tqdm
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 导入配置系统
 from config import (
@@ -35,6 +41,12 @@ from config import (
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _parse_json_response(response: requests.Response) -> Any:
+    """解析响应JSON，优先用orjson直接解析原始字节（避免先解码为str）"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
 class ClassificationApplier:
     """分类应用器"""
     
@@ -45,11 +57,22 @@ class ClassificationApplier:
         self.user_id = self.zotero_config.user_id
         self.headers = self.zotero_config.headers
         
+        # 复用同一个Session的连接池，避免每个请求重新建立TCP/TLS连接
+        # 429/5xx自动重试，并遵循Zotero返回的Retry-After
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
         # 统计信息
         self.total_items = 0
         self.processed_items = 0
         self.successful_applications = 0
         self.failed_applications = 0
+        
+        # 集合有效性缓存 {collection_key: bool}
+        self._collection_validity: Dict[str, bool] = {}
     
     def _load_classification_plan(self, plan_file: str) -> Dict[str, Any]:
         """加载分类计划文件"""
@@ -62,43 +85,21 @@ class ClassificationApplier:
             logger.error(f"❌ 加载分类计划失败: {e}")
             return {}
     
-    def _get_item_collections(self, item_key: str) -> List[str]:
-        """获取文献当前的集合"""
-        try:
-            url = f"{self.base_url}/items/{item_key}"
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            
-            item_data = response.json()
-            collections = item_data.get('data', {}).get('collections', [])
-            return collections
-                
-        except Exception as e:
-            logger.warning(f"获取文献 {item_key} 的集合失败: {e}")
-            return []
-    
-    def _get_item_version(self, item_key: str) -> Optional[str]:
-        """获取文献的版本号"""
-        try:
-            url = f"{self.base_url}/items/{item_key}"
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-
-            item_data = response.json()
-            return item_data.get('version')
-                
-        except Exception as e:
-            logger.warning(f"获取文献 {item_key} 的版本失败: {e}")
-            return None
-    
     def _validate_collection(self, collection_key: str) -> bool:
-        """验证集合是否存在"""
+        """验证集合是否存在（结果按集合key缓存，同一集合只请求一次）"""
+        if collection_key in self._collection_validity:
+            return self._collection_validity[collection_key]
+        
         try:
             url = f"{self.base_url}/collections/{collection_key}"
-            response = requests.get(url, headers=self.headers)
-            return response.status_code == 200
+            response = self.session.get(url, headers=self.headers)
+            is_valid = response.status_code == 200
         except Exception:
+            # 网络异常不缓存，下次重新验证
             return False
+        
+        self._collection_validity[collection_key] = is_valid
+        return is_valid
     
     def _get_valid_collections(self, collection_keys: List[str]) -> List[str]:
         """过滤出有效的集合"""
@@ -119,9 +120,15 @@ class ClassificationApplier:
                 logger.error(f"文献 {item_key} 的所有推荐集合都无效")
                 return False
             
-            # 获取当前集合
-            current_collections = self._get_item_collections(item_key)
-            logger.info(f"📋 文献 {item_key} 当前集合: {current_collections}")
+            # 获取完整的文献数据（当前集合和版本号都从这一次请求中读取）
+            url = f"{self.base_url}/items/{item_key}"
+            response = self.session.get(url, headers=self.headers)
+            response.raise_for_status()
+            item_data = _parse_json_response(response)
+            data = item_data.get('data', {})
+            
+            current_collections = data.get('collections', [])
+            logger.debug(f"📋 文献 {item_key} 当前集合: {current_collections}")
             
             # 验证当前集合的有效性，但保留所有当前集合（即使无效）
             valid_current_collections = []
@@ -134,34 +141,28 @@ class ClassificationApplier:
                     logger.warning(f"⚠️  当前集合 {coll} 不存在，但会保留在更新中")
             
             # 获取版本号
-            version = self._get_item_version(item_key)
+            version = item_data.get('version')
             if not version:
                 logger.error(f"无法获取文献 {item_key} 的版本号")
                 return False
             
-            # 合并集合（保留所有当前集合，添加新的推荐集合）
-            all_collections = list(set(current_collections + valid_collections))
-            logger.info(f"📋 合并后的集合: {all_collections}")
-            logger.info(f"📋 新增集合: {[c for c in valid_collections if c not in current_collections]}")
-            
-            # 获取完整的文献数据
-            url = f"{self.base_url}/items/{item_key}"
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            item_data = response.json()
+            # 合并集合（保留所有当前集合，添加新的推荐集合；按首次出现顺序去重，保持集合顺序稳定）
+            all_collections = list(dict.fromkeys(current_collections + valid_collections))
+            logger.debug(f"📋 合并后的集合: {all_collections}")
             
             # 更新集合字段（在data子对象中）
-            item_data['data']['collections'] = all_collections
+            data['collections'] = all_collections
             
             # 更新文献
             headers = self.headers.copy()
             headers['If-Unmodified-Since-Version'] = str(version)
             
-            response = requests.put(url, headers=headers, json=item_data)
+            response = self.session.put(url, headers=headers, json=item_data)
             response.raise_for_status()
             
-            new_collections = [c for c in valid_collections if c not in current_collections]
-            logger.info(f"✅ 成功更新文献 {item_key}: 添加 {len(new_collections)} 个新集合")
+            if logger.isEnabledFor(logging.DEBUG):
+                new_collections = [c for c in valid_collections if c not in current_collections]
+                logger.debug(f"✅ 成功更新文献 {item_key}: 添加 {len(new_collections)} 个新集合 {new_collections}")
             return True
             
         except requests.exceptions.HTTPError as e:
@@ -232,7 +233,7 @@ class ClassificationApplier:
         # 应用分类
         logger.info("🚀 开始应用分类...")
         
-        for classification in tqdm(successful_classifications, desc="应用进度"):
+        for classification in tqdm(successful_classifications, desc="应用进度", mininterval=0.5, disable=None):
             item_key = classification.get('item_key', '')
             collection_keys = classification.get('recommended_collections', [])
             
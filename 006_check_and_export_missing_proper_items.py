@@ -19,13 +19,19 @@ import sys
 import json
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Set
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # 导入配置系统
 from config import (
@@ -37,6 +43,33 @@ from config import (
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def _parse_json_response(response: requests.Response) -> Any:
+    """解析响应JSON，优先用orjson直接解析原始字节（避免先解码为str）"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+def _write_json_file(filepath: str, data: Any) -> None:
+    """写出JSON文件，优先使用orjson直接序列化为UTF-8字节（2空格缩进）"""
+    if orjson is not None:
+        with open(filepath, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+
+# 标准文献类型（排除附件、笔记等）
+PROPER_ITEM_TYPES = frozenset({
+    'journalArticle', 'conferencePaper', 'book', 'bookSection',
+    'thesis', 'report', 'document', 'preprint', 'patent',
+    'webpage', 'computerProgram', 'software', 'dataset',
+    'presentation', 'videoRecording', 'audioRecording',
+    'artwork', 'map', 'blogPost', 'forumPost', 'email',
+    'letter', 'manuscript', 'encyclopediaArticle', 'dictionaryEntry',
+    'newspaperArticle', 'magazineArticle', 'case', 'statute',
+    'hearing', 'bill', 'treaty', 'regulation', 'standard'
+})
+
 class MissingItemsChecker:
     """未分类文献检查器"""
     
@@ -47,6 +80,14 @@ class MissingItemsChecker:
         self.user_id = self.zotero_config.user_id
         self.headers = self.zotero_config.headers
         
+        # 复用同一个Session的连接池，避免每个请求重新建立TCP/TLS连接
+        # 429/5xx自动重试，并遵循Zotero返回的Retry-After
+        self.session = requests.Session()
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=8, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
         # 缓存集合信息
         self._collections_cache = None
         self._collections_cache_time = 0
@@ -61,16 +102,7 @@ class MissingItemsChecker:
             self._load_schema_collection_keys(schema_file)
         
         # 标准文献类型（排除附件、笔记等）
-        self.proper_item_types = {
-            'journalArticle', 'conferencePaper', 'book', 'bookSection', 
-            'thesis', 'report', 'document', 'preprint', 'patent',
-            'webpage', 'computerProgram', 'software', 'dataset',
-            'presentation', 'videoRecording', 'audioRecording',
-            'artwork', 'map', 'blogPost', 'forumPost', 'email',
-            'letter', 'manuscript', 'encyclopediaArticle', 'dictionaryEntry',
-            'newspaperArticle', 'magazineArticle', 'case', 'statute',
-            'hearing', 'bill', 'treaty', 'regulation', 'standard'
-        }
+        self.proper_item_types = PROPER_ITEM_TYPES
         
         # 统计信息
         self.total_items = 0
@@ -112,52 +144,74 @@ class MissingItemsChecker:
             logger.error(f"❌ 加载schema文件失败: {e}")
             self.schema_collection_keys = set()
     
-    def _get_all_items(self, limit: int = None) -> List[Dict[str, Any]]:
-        """获取所有文献项目（优化版本）"""
-        all_items = []
-        start = 0
+    def _fetch_items_page(self, start: int, batch_size: int) -> requests.Response:
+        """获取单页文献项目"""
+        url = f"{self.base_url}/items"
+        params = {
+            'start': start,
+            'limit': batch_size,
+            'format': 'json'
+        }
+        
+        response = self.session.get(url, headers=self.headers, params=params, timeout=30)
+        response.raise_for_status()
+        return response
+    
+    def _get_all_items(self, limit: int = None) -> Optional[List[Dict[str, Any]]]:
+        """获取所有文献项目（并发分页版本），任何一页获取失败都返回None，避免缺页的文献从报告中静默消失"""
         batch_size = min(limit or get_default_limit(), 100)  # 限制批量大小
         
         logger.info(f"📊 开始获取文献项目 (批量大小: {batch_size})...")
         
-        while True:
-            try:
-                url = f"{self.base_url}/items"
-                params = {
-                    'start': start,
-                    'limit': batch_size,
-                    'format': 'json'
+        # 先获取第一页，从Total-Results响应头得到总数
+        try:
+            response = self._fetch_items_page(0, batch_size)
+            first_items = _parse_json_response(response)
+            total = int(response.headers.get('Total-Results', len(first_items)))
+        except Exception as e:
+            logger.error(f"❌ 获取文献项目失败: {e}")
+            return None
+        
+        if limit:
+            total = min(total, limit)
+        
+        # 剩余页面通过Session连接池并发获取，按起始位置保存以保持原有顺序
+        pages = {0: first_items}
+        offsets = range(batch_size, total, batch_size) if first_items else range(0)
+        if offsets:
+            with ThreadPoolExecutor(max_workers=min(8, len(offsets))) as executor:
+                future_to_start = {
+                    executor.submit(self._fetch_items_page, start, batch_size): start
+                    for start in offsets
                 }
-            
-                response = requests.get(url, headers=self.headers, params=params, timeout=30)
-                response.raise_for_status()
-                
-                items = response.json()
-                if not items:
-                    break
-                
-                all_items.extend(items)
-                start += len(items)
-                
-                if len(all_items) % 500 == 0:
-                    logger.info(f"📦 已获取 {len(all_items)} 个项目...")
-                
-                # 如果达到限制，停止
-                if limit and len(all_items) >= limit:
-                    all_items = all_items[:limit]
-                    break
-                    
-                # 如果返回的项目数少于批量大小，说明已经获取完所有项目
-                if len(items) < batch_size:
-                    break
-                
-            except Exception as e:
-                logger.error(f"❌ 获取文献项目失败: {e}")
-                break
+                for future in as_completed(future_to_start):
+                    start = future_to_start[future]
+                    try:
+                        pages[start] = _parse_json_response(future.result())
+                    except Exception as e:
+                        logger.error(f"❌ 获取文献项目失败 (start={start}): {e}")
+                        for pending in future_to_start:
+                            pending.cancel()
+                        return None
+        
+        all_items = [item for start in sorted(pages) for item in pages[start]]
+        
+        # 如果达到限制，截断
+        if limit and len(all_items) > limit:
+            all_items = all_items[:limit]
         
         logger.info(f"✅ 总共获取到 {len(all_items)} 个项目")
         return all_items
     
+    def _fetch_collections_page(self, start: int) -> requests.Response:
+        """获取单页集合（Zotero默认只返回25个，需显式分页）"""
+        url = f"{self.base_url}/collections"
+        params = {'start': start, 'limit': 100}
+        
+        response = self.session.get(url, headers=self.headers, params=params, timeout=30)
+        response.raise_for_status()
+        return response
+
     def _get_all_collections(self) -> Dict[str, str]:
         """获取所有集合的key到name的映射（带缓存）"""
         current_time = time.time()
@@ -168,11 +222,17 @@ class MissingItemsChecker:
             return self._collections_cache
         
         try:
-            url = f"{self.base_url}/collections"
-            response = requests.get(url, headers=self.headers, timeout=30)
-            response.raise_for_status()
+            response = self._fetch_collections_page(0)
+            collections = _parse_json_response(response)
+            
+            # 根据Total-Results并发获取剩余页面
+            total = int(response.headers.get('Total-Results', len(collections)))
+            offsets = range(100, total, 100) if collections else range(0)
+            if offsets:
+                with ThreadPoolExecutor(max_workers=min(8, len(offsets))) as executor:
+                    for page in executor.map(self._fetch_collections_page, offsets):
+                        collections.extend(_parse_json_response(page))
             
-            collections = response.json()
             collection_dict = {}
             
             for collection in collections:
@@ -193,8 +253,7 @@ class MissingItemsChecker:
     
     def _is_proper_item(self, item: Dict[str, Any]) -> bool:
         """判断是否为标准文献项目"""
-        item_type = item.get('data', {}).get('itemType', '')
-        return item_type in self.proper_item_types
+        return item.get('data', {}).get('itemType') in PROPER_ITEM_TYPES
     
     def _needs_classification(self, item: Dict[str, Any]) -> bool:
         """判断项目是否需要分类"""
@@ -208,55 +267,33 @@ class MissingItemsChecker:
         if not self.schema_collection_keys:
             return False
         
-        # 检查文献的集合是否在schema中
-        for collection_key in collections:
-            if collection_key in self.schema_collection_keys:
-                # 如果文献在schema中的集合里，说明已分类
-                return False
-        
-        # 如果文献的集合都不在schema中，说明未分类
-        return True
+        # 文献的集合都不在schema中，说明未分类
+        return self.schema_collection_keys.isdisjoint(collections)
     
     def _get_item_details_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """批量获取文献详细信息（并行处理）"""
+        """批量提取文献详细信息（列表接口已返回完整data，无需逐条请求）"""
         if not items:
             return []
         
-        logger.info(f"🔍 开始批量获取 {len(items)} 个项目的详细信息...")
+        logger.info(f"🔍 开始提取 {len(items)} 个项目的详细信息...")
         
-        # 使用线程池并行处理
-        max_workers = min(10, len(items))  # 限制并发数
+        # 集合映射只获取一次
+        all_collections = self._get_all_collections()
         detailed_items = []
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            # 提交所有任务
-            future_to_item = {
-                executor.submit(self._get_single_item_details, item): item 
-                for item in items
-            }
+        for completed, item in enumerate(items, 1):
+            details = self._get_single_item_details(item, all_collections)
+            if details:
+                detailed_items.append(details)
             
-            # 收集结果
-            completed = 0
-            for future in as_completed(future_to_item):
-                try:
-                    details = future.result()
-                    if details:
-                        detailed_items.append(details)
-                    completed += 1
-                    
-                    if completed % 50 == 0:
-                        logger.info(f"📋 已处理 {completed}/{len(items)} 个项目...")
-                        
-                except Exception as e:
-                    item = future_to_item[future]
-                    logger.warning(f"⚠️  处理项目失败 {item.get('key', 'unknown')}: {e}")
-                    completed += 1
+            if completed % 50 == 0:
+                logger.info(f"📋 已处理 {completed}/{len(items)} 个项目...")
         
         logger.info(f"✅ 批量处理完成，成功获取 {len(detailed_items)} 个项目的详细信息")
         return detailed_items
     
-    def _get_single_item_details(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """获取单个文献详细信息"""
+    def _get_single_item_details(self, item: Dict[str, Any], all_collections: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """从已获取的项目数据中提取单个文献详细信息（不发起请求）"""
         try:
             item_data = item.get('data', {})
             
@@ -308,7 +345,6 @@ class MissingItemsChecker:
                 details['collections_keys'] = '; '.join(collections)
                 
                 # 获取集合名称
-                all_collections = self._get_all_collections()
                 collection_names = []
                 for collection_key in collections:
                     collection_name = all_collections.get(collection_key, '')
@@ -344,7 +380,12 @@ class MissingItemsChecker:
         author_names = []
         for creator in creators:
             if creator.get('creatorType') == 'author':
-                name = creator.get('name', '') or f"{creator.get('firstName', '')} {creator.get('lastName', '')}".strip()
+                # 单字段姓名直接使用；双字段姓名只在两者都存在时拼接
+                name = creator.get('name')
+                if not name:
+                    first = creator.get('firstName')
+                    last = creator.get('lastName')
+                    name = first + ' ' + last if first and last else last or first
                 if name:
                     author_names.append(name)
         
@@ -357,13 +398,15 @@ class MissingItemsChecker:
         if not abstract:
             abstract = item_data.get('extra', '')
         if not abstract:
-            # 从notes中查找摘要
-            notes = item_data.get('notes', [])
-            for note in notes:
-                note_content = note.get('data', {}).get('note', '')
-                if 'abstract' in note_content.lower() or '摘要' in note_content:
-                    abstract = note_content
-                    break
+            # 从notes中查找摘要（摘要标记通常出现在笔记开头，只检查前200个字符）
+            notes = item_data.get('notes')
+            if notes:
+                for note in notes:
+                    note_content = note.get('data', {}).get('note', '')
+                    head = note_content[:200]
+                    if '摘要' in head or 'abstract' in head.lower():
+                        abstract = note_content
+                        break
         
         # 限制摘要长度
         abstract_limit = self.abstract_limit
@@ -381,25 +424,27 @@ class MissingItemsChecker:
         tag_names = [tag.get('tag', '') for tag in tags if tag.get('tag')]
         return '; '.join(tag_names)
     
-    def check_missing_items(self, limit: int = None) -> List[Dict[str, Any]]:
-        """检查未分类的标准文献项目（优化版本）"""
+    def check_missing_items(self, limit: int = None) -> Optional[List[Dict[str, Any]]]:
+        """检查未分类的标准文献项目（优化版本），获取文献项目失败时返回None"""
         start_time = time.time()
         logger.info("🔍 开始检查未分类的标准文献项目...")
         
-        # 获取所有项目
+        # 获取所有项目（不完整的项目列表会让报告漏掉文献，直接放弃本次检查）
         all_items = self._get_all_items(limit)
+        if all_items is None:
+            return None
         self.total_items = len(all_items)
         
-        # 筛选标准文献项目
-        proper_items = [item for item in all_items if self._is_proper_item(item)]
-        self.proper_items = len(proper_items)
-        
-        # 筛选需要分类的项目（未分类和临时集合中的文献）
+        # 单次遍历：统计标准文献项目，同时筛选需要分类的项目（未分类和临时集合中的文献）
+        proper_count = 0
         unfiled_items = []
-        for item in proper_items:
-            if self._needs_classification(item):
-                unfiled_items.append(item)
+        for item in all_items:
+            if self._is_proper_item(item):
+                proper_count += 1
+                if self._needs_classification(item):
+                    unfiled_items.append(item)
         
+        self.proper_items = proper_count
         self.unfiled_items = len(unfiled_items)
         
         # 批量获取详细信息
@@ -443,8 +488,7 @@ class MissingItemsChecker:
         
             try:
                 os.makedirs(os.path.dirname(output_file), exist_ok=True)
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    json.dump(export_data, f, ensure_ascii=False, indent=2)
+                _write_json_file(output_file, export_data)
         
                 logger.info(f"✅ 未分类文献已导出到: {output_file}")
                 return output_file
@@ -520,6 +564,9 @@ def main():
     # 检查未分类文献
     unfiled_items = checker.check_missing_items(limit=args.limit)
     
+    if unfiled_items is None:
+        print("❌ 获取文献项目失败，未生成报告")
+        return 1
     if not unfiled_items:
         print("✅ 没有发现未分类的标准文献项目")
         return 0
@@ -44,9 +44,13 @@ class LLMConfig(BaseSettings):
     
     # 速率限制
     rpm_limit: int = Field(default=5, description="每分钟请求限制")
+    max_concurrency: int = Field(default=20, description="并发请求的最大数量")
     timeout: float = Field(default=30.0, description="请求超时时间")
     connect_timeout: float = Field(default=10.0, description="连接超时时间")
     
+    # 提示词前缀缓存（Claude需要显式标记cache_control，OpenAI等自动缓存）
+    prompt_cache: bool = Field(default=True, description="是否为系统提示词启用前缀缓存")
+    
     def model_post_init(self, __context) -> None:
         """模型初始化后验证"""
         if self.api_type == 'gemini-direct' and not self.gemini_api_key:
@@ -7,24 +7,30 @@ LLM Client - 统一的LLM客户端
 
 import os
 import time
+import asyncio
+import threading
 import json
 import hashlib
 import httpx
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Iterator
 import logging
 from datetime import datetime
 from pathlib import Path
 from collections import deque
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor
+import openai
+from openai import OpenAI, AsyncOpenAI
 try:
     from anthropic import Anthropic
 except ImportError:
     Anthropic = None
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_random_exponential
 try:
     from google import genai
+    from google.genai import errors as genai_errors
 except ImportError:
     genai = None
+    genai_errors = None
 
 # 导入配置
 from config import get_llm_config
@@ -33,6 +39,36 @@ from config import get_llm_config
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+def _is_retryable_llm_error(exc: BaseException) -> bool:
+    """
+    是否为可重试的瞬时错误：限流、超时、连接错误和5xx（OpenAI兼容接口与官方Gemini SDK）
+    
+    其他错误（400/401/404等接口错误、代码错误）重试也不会成功，直接失败；
+    KeyboardInterrupt、CancelledError等非Exception异常从不重试，保证Ctrl-C和任务取消立即生效
+    """
+    if not isinstance(exc, Exception):
+        return False
+    if isinstance(exc, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    if genai_errors is not None:
+        if isinstance(exc, genai_errors.ServerError):
+            return True
+        if isinstance(exc, genai_errors.ClientError) and exc.code == 429:
+            return True
+    # 官方Gemini SDK底层使用httpx，超时和连接错误以httpx异常抛出
+    return isinstance(exc, httpx.TransportError)
+
+
+# 瞬时错误按带随机抖动的指数退避重试，最后一次失败时抛出原始异常（而不是tenacity.RetryError）
+_llm_retry = retry(
+    retry=retry_if_exception(_is_retryable_llm_error),
+    stop=stop_after_attempt(4),
+    wait=wait_random_exponential(multiplier=1, max=30),
+    reraise=True
+)
+
+
 class RateLimiter:
     """简单的速率限制器，基于滑动窗口"""
     
@@ -40,6 +76,8 @@ class RateLimiter:
         self.max_requests = max_requests
         self.window_seconds = window_seconds
         self.requests = deque()
+        # 多线程调用时保护检查与记录
+        self._lock = threading.Lock()
     
     def can_proceed(self) -> bool:
         """检查是否可以继续请求"""
@@ -61,15 +99,28 @@ class RateLimiter:
         self.requests.append(now)
     
     def wait_if_needed(self):
-        """如果需要，等待直到可以继续请求"""
+        """如果需要，等待直到可以继续请求（线程安全）"""
+        while True:
+            with self._lock:
+                if self.can_proceed() or not self.requests:
+                    self.record_request()
+                    return
+                # 计算需要等待的时间
+                wait_time = self.window_seconds - (time.time() - self.requests[0])
+            
+            if wait_time > 0:
+                logger.info(f"⏳ 速率限制: 等待 {wait_time:.1f} 秒...")
+                time.sleep(wait_time)
+    
+    async def async_wait_if_needed(self):
+        """异步版本的wait_if_needed，等待时不阻塞事件循环"""
         while not self.can_proceed():
-            # 计算需要等待的时间
             if self.requests:
                 oldest_request = self.requests[0]
                 wait_time = self.window_seconds - (time.time() - oldest_request)
                 if wait_time > 0:
                     logger.info(f"⏳ 速率限制: 等待 {wait_time:.1f} 秒...")
-                    time.sleep(wait_time)
+                    await asyncio.sleep(wait_time)
             else:
                 break
         
@@ -94,9 +145,19 @@ class LLMClient:
         # 初始化缓存目录
         self.cache_dir = Path("./.cache/llm_responses")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        
+        # Batch API任务状态与上传文件单独存放，不混入回复缓存
+        self.batch_dir = Path("./.cache/llm_batches")
+
         # 设置超时参数
         timeout_config = httpx.Timeout(config.timeout, connect=config.connect_timeout)
+        self.timeout_config = timeout_config
+        
+        # 并发请求数（generate_texts使用）
+        self.max_concurrency = config.max_concurrency
+        self._async_client = None
+        
+        # 提示词前缀缓存
+        self.prompt_cache = config.prompt_cache
         
         # 初始化速率限制器
         self.rate_limiter = None
@@ -175,14 +236,85 @@ class LLMClient:
                 "timestamp": datetime.now().isoformat()
             }
             
-            with open(cache_file, 'w', encoding='utf-8') as f:
+            # 先写临时文件再原子替换，避免中断或并发请求留下半写的缓存文件
+            tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.{id(cache_data)}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 json.dump(cache_data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_file, cache_file)
                 
             logger.debug(f"💾 缓存已保存 (model: {self.model_name}, cache: {cache_key[:8]}...)")
         except Exception as e:
             logger.warning(f"保存缓存失败: {str(e)}")
 
-    @retry(stop=stop_after_attempt(2), wait=wait_exponential(multiplier=1, min=2, max=5))
+    def _build_chat_params(self, prompt: str, system_prompt: Optional[str], max_tokens: int,
+                           temperature: float, tools: Optional[List[Dict]]) -> Dict[str, Any]:
+        """构建OpenAI兼容接口的调用参数"""
+        messages = []
+        if system_prompt:
+            if self.prompt_cache and self.client_type == "anthropic":
+                # Claude只缓存显式标记的前缀，系统提示词在各次调用间不变，标记为可缓存
+                messages.append({"role": "system", "content": [
+                    {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+                ]})
+            else:
+                # OpenAI等会自动缓存相同的前缀，系统提示词放在最前面且保持不变即可命中
+                messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        
+        api_params = {
+            "model": self.model_name,
+            "messages": messages,
+            "max_tokens": max_tokens,
+            "temperature": temperature
+        }
+        
+        # 如果提供了工具，添加工具调用支持
+        if tools:
+            api_params["tools"] = tools
+            api_params["tool_choice"] = "auto"
+        
+        return api_params
+    
+    def _parse_chat_response(self, response) -> Dict[str, Any]:
+        """解析OpenAI兼容接口的响应"""
+        message = response.choices[0].message
+        
+        # 记录前缀缓存命中情况（不支持的接口没有该字段）
+        usage = getattr(response, 'usage', None)
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached_tokens = getattr(details, 'cached_tokens', None)
+        if cached_tokens and usage.prompt_tokens:
+            logger.info(f"🧊 前缀缓存命中: {cached_tokens:,}/{usage.prompt_tokens:,} 输入tokens ({cached_tokens / usage.prompt_tokens:.0%})")
+        
+        result = {
+            "content": message.content,
+            "tool_calls": []
+        }
+        
+        # 检查是否有工具调用
+        if hasattr(message, 'tool_calls') and message.tool_calls:
+            for tool_call in message.tool_calls:
+                result["tool_calls"].append({
+                    "id": tool_call.id,
+                    "function": {
+                        "name": tool_call.function.name,
+                        "arguments": tool_call.function.arguments
+                    }
+                })
+        
+        return result
+    
+    def _supports_async(self) -> bool:
+        """是否使用OpenAI兼容接口（官方Gemini SDK客户端不走异步路径）"""
+        return isinstance(self.client, OpenAI)
+    
+    def _get_async_client(self) -> AsyncOpenAI:
+        """懒加载异步客户端"""
+        if self._async_client is None:
+            self._async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout_config)
+        return self._async_client
+
+    @_llm_retry
     def generate(self, prompt: str, system_prompt: Optional[str] = None, 
                  max_tokens: int = 4096, temperature: float = 0.7,
                  tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
@@ -215,82 +347,14 @@ class LLMClient:
                     }
                 else:
                     # 代理API - OpenAI兼容接口
-                    messages = []
-                    if system_prompt:
-                        messages.append({"role": "system", "content": system_prompt})
-                    messages.append({"role": "user", "content": prompt})
-                    
-                    # 构建API调用参数
-                    api_params = {
-                        "model": self.model_name,
-                        "messages": messages,
-                        "max_tokens": max_tokens,
-                        "temperature": temperature
-                    }
-                    
-                    # 如果提供了工具，添加工具调用支持
-                    if tools:
-                        api_params["tools"] = tools
-                        api_params["tool_choice"] = "auto"
-                    
+                    api_params = self._build_chat_params(prompt, system_prompt, max_tokens, temperature, tools)
                     response = self.client.chat.completions.create(**api_params)
-                    
-                    # OpenAI兼容接口响应格式
-                    message = response.choices[0].message
-                    result = {
-                        "content": message.content,
-                        "tool_calls": []
-                    }
-                    
-                    # 检查是否有工具调用
-                    if hasattr(message, 'tool_calls') and message.tool_calls:
-                        for tool_call in message.tool_calls:
-                            result["tool_calls"].append({
-                                "id": tool_call.id,
-                                "function": {
-                                    "name": tool_call.function.name,
-                                    "arguments": tool_call.function.arguments
-                                }
-                            })
+                    result = self._parse_chat_response(response)
             else:
                 # OpenAI兼容接口
-                messages = []
-                if system_prompt:
-                    messages.append({"role": "system", "content": system_prompt})
-                messages.append({"role": "user", "content": prompt})
-                
-                # 构建API调用参数
-                api_params = {
-                    "model": self.model_name,
-                    "messages": messages,
-                    "max_tokens": max_tokens,
-                    "temperature": temperature
-                }
-                
-                # 如果提供了工具，添加工具调用支持
-                if tools:
-                    api_params["tools"] = tools
-                    api_params["tool_choice"] = "auto"
-                
+                api_params = self._build_chat_params(prompt, system_prompt, max_tokens, temperature, tools)
                 response = self.client.chat.completions.create(**api_params)
-                
-                # OpenAI兼容接口响应格式
-                message = response.choices[0].message
-                result = {
-                    "content": message.content,
-                    "tool_calls": []
-                }
-                
-                # 检查是否有工具调用
-                if hasattr(message, 'tool_calls') and message.tool_calls:
-                    for tool_call in message.tool_calls:
-                        result["tool_calls"].append({
-                            "id": tool_call.id,
-                            "function": {
-                                "name": tool_call.function.name,
-                                "arguments": tool_call.function.arguments
-                            }
-                        })
+                result = self._parse_chat_response(response)
             
             # 保存到缓存
             self._save_cached_response(cache_key, prompt, system_prompt, result, max_tokens, temperature, tools)
@@ -310,6 +374,53 @@ class LLMClient:
                 logger.error(f"OpenAI API调用失败 (model: {self.model_name}): {str(e)}")
             raise
     
+    def generate_stream(self, prompt: str, system_prompt: Optional[str] = None,
+                        max_tokens: int = 4096, temperature: float = 0.7) -> Iterator[str]:
+        """
+        流式生成文本，逐块返回内容
+        
+        与generate共用缓存：命中缓存时一次性返回完整内容；流完整结束后才写入缓存，
+        调用方提前close()时底层HTTP流随之关闭，不再继续计费
+        """
+        cache_key = self._generate_cache_key(prompt, system_prompt, max_tokens, temperature)
+        cached_response = self._get_cached_response(cache_key)
+        if cached_response is not None:
+            yield cached_response.get("content", "")
+            return
+        
+        if self.rate_limiter:
+            self.rate_limiter.wait_if_needed()
+        
+        logger.warning(f"🌐 流式调用API (model: {self.model_name}, cache: {cache_key[:8]}...)")
+        
+        parts = []
+        if isinstance(self.client, OpenAI):
+            api_params = self._build_chat_params(prompt, system_prompt, max_tokens, temperature, None)
+            api_params["stream"] = True
+            stream = self.client.chat.completions.create(**api_params)
+            try:
+                for event in stream:
+                    if not event.choices:
+                        continue
+                    delta = event.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+            finally:
+                stream.close()
+        else:
+            # 官方Gemini API
+            full_prompt = prompt
+            if system_prompt:
+                full_prompt = f"System: {system_prompt}\n\n{prompt}"
+            for chunk in self.client.models.generate_content_stream(model=self.model_name, contents=full_prompt):
+                if chunk.text:
+                    parts.append(chunk.text)
+                    yield chunk.text
+        
+        result = {"content": "".join(parts), "tool_calls": []}
+        self._save_cached_response(cache_key, prompt, system_prompt, result, max_tokens, temperature)
+    
     def _call_official_gemini_api(self, prompt: str, system_prompt: Optional[str] = None, 
                                  max_tokens: int = 4096, temperature: float = 0.7) -> Dict[str, Any]:
         """调用官方Gemini API使用google.generativeai库"""
@@ -344,4 +455,273 @@ class LLMClient:
                      max_tokens: int = 4096, temperature: float = 0.7) -> str:
         """向后兼容的文本生成方法"""  
         result = self.generate(prompt, system_prompt, max_tokens, temperature)
-        return result.get("content", "")
\ No newline at end of file
+        return result.get("content", "")
+    
+    @_llm_retry
+    async def agenerate(self, prompt: str, system_prompt: Optional[str] = None,
+                        max_tokens: int = 4096, temperature: float = 0.7,
+                        tools: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        """异步生成回复（OpenAI兼容接口），与generate共用缓存"""
+        cache_key = self._generate_cache_key(prompt, system_prompt, max_tokens, temperature, tools)
+        cached_response = self._get_cached_response(cache_key)
+        if cached_response is not None:
+            return cached_response
+        
+        try:
+            if self.rate_limiter:
+                await self.rate_limiter.async_wait_if_needed()
+            
+            logger.warning(f"🌐 调用API (model: {self.model_name}, cache: {cache_key[:8]}...)")
+            
+            api_params = self._build_chat_params(prompt, system_prompt, max_tokens, temperature, tools)
+            response = await self._get_async_client().chat.completions.create(**api_params)
+            result = self._parse_chat_response(response)
+            
+            self._save_cached_response(cache_key, prompt, system_prompt, result, max_tokens, temperature, tools)
+            
+            return result
+        
+        except Exception as e:
+            logger.error(f"异步API调用失败 (model: {self.model_name}): {str(e)}")
+            raise
+    
+    async def _agenerate_texts(self, prompts: List[str], system_prompt: Optional[str],
+                               max_tokens: int, temperature: float) -> List[Any]:
+        """并发执行多个请求，用信号量限制同时在途的请求数"""
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def _one(prompt: str) -> str:
+            async with semaphore:
+                result = await self.agenerate(prompt, system_prompt, max_tokens, temperature)
+                return result.get("content", "")
+        
+        try:
+            return await asyncio.gather(*(_one(prompt) for prompt in prompts), return_exceptions=True)
+        finally:
+            # 事件循环结束前关闭连接，下次调用重新创建客户端
+            if self._async_client is not None:
+                await self._async_client.close()
+                self._async_client = None
+    
+    def generate_texts(self, prompts: List[str], system_prompt: Optional[str] = None,
+                       max_tokens: int = 4096, temperature: float = 0.7) -> List[Any]:
+        """
+        批量并发生成文本，结果顺序与prompts一致
+        
+        单个请求失败时对应位置返回异常对象而不是抛出，由调用方处理；
+        相同的prompt只请求一次，结果复用到所有位置
+        """
+        if not prompts:
+            return []
+        
+        unique_prompts = list(dict.fromkeys(prompts))
+        
+        if not self._supports_async():
+            # 官方Gemini SDK客户端没有异步接口，使用线程池并发调用同步接口
+            def _one(prompt: str) -> Any:
+                try:
+                    return self.generate_text(prompt, system_prompt, max_tokens, temperature)
+                except Exception as e:
+                    return e
+            
+            max_workers = min(self.max_concurrency, len(unique_prompts))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                unique_results = list(executor.map(_one, unique_prompts))
+        else:
+            unique_results = asyncio.run(self._agenerate_texts(unique_prompts, system_prompt, max_tokens, temperature))
+        
+        if len(unique_prompts) == len(prompts):
+            return unique_results
+        
+        logger.info(f"♻️  合并重复请求: {len(prompts)} -> {len(unique_prompts)}")
+        result_by_prompt = dict(zip(unique_prompts, unique_results))
+        return [result_by_prompt[prompt] for prompt in prompts]
+    
+    def generate_texts_batch_api(self, prompts: List[str], system_prompt: Optional[str] = None,
+                                 max_tokens: int = 4096, temperature: float = 0.7,
+                                 poll_interval: int = 30, max_wait: float = 24 * 3600) -> List[Any]:
+        """
+        通过OpenAI Batch API批量生成文本（费用减半，最长24小时完成）
+        
+        已缓存的prompt不会重复提交，返回结果顺序与prompts一致，
+        失败的请求在对应位置返回异常对象。
+        提交后的任务ID按待提交请求的缓存键记录在 .cache/llm_batches/ 中，
+        进程中断或等待超过max_wait秒（抛出TimeoutError）后，用相同输入重新运行会接着等待同一个任务，不会重复提交
+        """
+        if not self._supports_async():
+            raise RuntimeError("Batch API仅支持OpenAI兼容接口")
+        
+        results: List[Any] = [None] * len(prompts)
+        batch_lines = []
+        cache_keys = {}
+        # 相同的prompt只提交一次
+        first_index = {}
+        duplicates = []
+        for idx, prompt in enumerate(prompts):
+            if prompt in first_index:
+                duplicates.append((idx, first_index[prompt]))
+                continue
+            first_index[prompt] = idx
+            
+            cache_key = self._generate_cache_key(prompt, system_prompt, max_tokens, temperature)
+            cached_response = self._get_cached_response(cache_key)
+            if cached_response is not None:
+                results[idx] = cached_response.get("content", "")
+                continue
+            
+            # 以缓存键作为custom_id，重启后仍能把输出映射回对应的prompt
+            cache_keys[cache_key] = idx
+            batch_lines.append(json.dumps({
+                "custom_id": cache_key,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": self._build_chat_params(prompt, system_prompt, max_tokens, temperature, None)
+            }, ensure_ascii=False))
+        
+        if not batch_lines:
+            for idx, source_idx in duplicates:
+                results[idx] = results[source_idx]
+            return results
+        
+        # 同一组待提交请求对应同一个任务状态文件
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        job_key = hashlib.md5('\n'.join(sorted(cache_keys)).encode('utf-8')).hexdigest()
+        state_file = self.batch_dir / f"batch_{job_key}.json"
+        
+        batch = None
+        if state_file.exists():
+            try:
+                state = json.loads(state_file.read_text(encoding='utf-8'))
+                batch = self.client.batches.retrieve(state["batch_id"])
+            except Exception as e:
+                logger.warning(f"读取Batch任务状态失败，将重新提交: {str(e)}")
+            if batch is not None and batch.status in ("failed", "expired", "cancelled"):
+                logger.warning(f"⚠️  上次的Batch任务 {batch.id} 已{batch.status}，将重新提交")
+                batch = None
+            if batch is not None:
+                logger.info(f"🔁 继续等待上次提交的Batch任务 {batch.id}，共 {len(batch_lines)} 个请求")
+        
+        if batch is None:
+            # 写入JSONL输入文件并上传，上传后即删除
+            batch_input_file = self.batch_dir / f"batch_input_{job_key}.jsonl"
+            batch_input_file.write_text('\n'.join(batch_lines) + '\n', encoding='utf-8')
+            try:
+                with open(batch_input_file, 'rb') as f:
+                    uploaded = self.client.files.create(file=f, purpose="batch")
+            finally:
+                batch_input_file.unlink(missing_ok=True)
+            
+            batch = self.client.batches.create(
+                input_file_id=uploaded.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            state = {
+                "batch_id": batch.id,
+                "cache_keys": sorted(cache_keys),
+                "created_at": datetime.now().isoformat()
+            }
+            state_file.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding='utf-8')
+            logger.info(f"📤 已提交Batch任务 {batch.id}，共 {len(batch_lines)} 个请求")
+        
+        # 轮询任务状态，超过max_wait后放弃等待，保留状态文件供下次继续
+        deadline = time.monotonic() + max_wait
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"等待Batch任务超时: {batch.id} ({batch.status})，重新运行将继续等待该任务")
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            if counts is not None:
+                logger.info(f"⏳ Batch任务 {batch.status}: {counts.completed}/{counts.total}")
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            state_file.unlink(missing_ok=True)
+            raise RuntimeError(f"Batch任务未完成: {batch.id} ({batch.status})")
+        
+        # 下载输出文件，按custom_id映射回原位置
+        output = self.client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            cache_key = record.get("custom_id")
+            if cache_key not in cache_keys:
+                continue
+            idx = cache_keys.pop(cache_key)
+            
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                results[idx] = RuntimeError(f"Batch请求失败: {record.get('error') or response.get('status_code')}")
+                continue
+            
+            content = response["body"]["choices"][0]["message"].get("content") or ""
+            result = {"content": content, "tool_calls": []}
+            self._save_cached_response(cache_key, prompts[idx], system_prompt, result, max_tokens, temperature)
+            results[idx] = content
+        
+        # 成功的结果已写入回复缓存，任务状态不再需要
+        state_file.unlink(missing_ok=True)
+        
+        # 输出文件中缺失的请求（例如错误记录在error_file中）
+        for idx in cache_keys.values():
+            results[idx] = RuntimeError("Batch输出中缺少该请求的结果")
+        
+        for idx, source_idx in duplicates:
+            results[idx] = results[source_idx]
+        
+        return results
+        
+        # 写入JSONL输入文件并上传
+        batch_input_file = self.cache_dir / f"batch_input_{datetime.now().strftime('%Y%m%d_%H%M%S')}.jsonl"
+        batch_input_file.write_text('\n'.join(batch_lines) + '\n', encoding='utf-8')
+        with open(batch_input_file, 'rb') as f:
+            uploaded = self.client.files.create(file=f, purpose="batch")
+        
+        batch = self.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        logger.info(f"📤 已提交Batch任务 {batch.id}，共 {len(batch_lines)} 个请求")
+        
+        # 轮询任务状态
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            if counts is not None:
+                logger.info(f"⏳ Batch任务 {batch.status}: {counts.completed}/{counts.total}")
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise RuntimeError(f"Batch任务未完成: {batch.id} ({batch.status})")
+        
+        # 下载输出文件，按custom_id映射回原位置
+        output = self.client.files.content(batch.output_file_id).text
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            custom_id = record.get("custom_id")
+            if custom_id not in cache_keys:
+                continue
+            idx, cache_key = cache_keys.pop(custom_id)
+            
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                results[idx] = RuntimeError(f"Batch请求失败: {record.get('error') or response.get('status_code')}")
+                continue
+            
+            content = response["body"]["choices"][0]["message"].get("content") or ""
+            result = {"content": content, "tool_calls": []}
+            self._save_cached_response(cache_key, prompts[idx], system_prompt, result, max_tokens, temperature)
+            results[idx] = content
+        
+        # 输出文件中缺失的请求（例如错误记录在error_file中）
+        for idx, _ in cache_keys.values():
+            results[idx] = RuntimeError("Batch输出中缺少该请求的结果")
+        
+        for idx, source_idx in duplicates:
+            results[idx] = results[source_idx]
+        
+        return results